@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+"""
+Per-call `subprocess.check_output(cmd, shell=True)`, as nwgcc used to run its probes, vs. the persistent shell
+coprocess (nwgcc/coprocess.py), on commands like the default 'get_battery' and 'get_bt_*' pipelines.
+
+Usage: python3 benchmarks/coprocess.py [ticks]
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from nwgcc.coprocess import ShellWorker
+
+# stand-ins w/ the same shape as the default pipelines, not depending on upower / bluetoothctl being installed
+COMMANDS = [
+    "printf 'state: discharging\\npercentage: 61%%\\n' | grep --color=never -E 'state|percentage'",
+    "printf 'Powered: yes\\n' | awk '/Powered/{print $2}'",
+    "printf 'Name: laptop\\n' | awk '/Name/{print $2}'",
+    "echo $USER",
+]
+
+
+def per_call(ticks):
+    outputs = []
+    for i in range(ticks):
+        outputs = [subprocess.check_output(cmd, shell=True).decode("utf-8").strip() for cmd in COMMANDS]
+    return outputs
+
+
+def batched(ticks):
+    worker = ShellWorker()
+    outputs = []
+    for i in range(ticks):
+        outputs = [result[0] for result in worker.run_batch(COMMANDS, timeout=10)]
+    worker.stop()
+    return outputs
+
+
+def main():
+    ticks = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print("{} ticks x {} commands".format(ticks, len(COMMANDS)))
+    results = []
+    for name, function in [("per-call check_output", per_call), ("shell coprocess", batched)]:
+        start = time.perf_counter()
+        outputs = function(ticks)
+        elapsed = time.perf_counter() - start
+        results.append(outputs)
+        print("{:<24} {:8.1f} ms total {:8.3f} ms per tick".format(name, elapsed * 1000, elapsed * 1000 / ticks))
+
+    if results[0] != results[1]:
+        print("ERROR: outputs differ: {} vs {}".format(results[0], results[1]))
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+import os
+
+sysfs_dir = "/sys/class/backlight"
+
+# as recommended in the kernel backlight ABI documentation
+type_preference = ["firmware", "platform", "raw"]
+
+
+class Backlight(object):
+    """
+    Reads and writes /sys/class/backlight/<device> directly, keeping the files open,
+    so that neither reading nor setting the brightness costs a process.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+        with open(os.path.join(path, "max_brightness")) as f:
+            self.max = int(f.read())
+
+        actual = os.path.join(path, "actual_brightness")
+        self.fd_read = os.open(actual if os.path.isfile(actual) else os.path.join(path, "brightness"), os.O_RDONLY)
+        # writing usually takes the 'video' group or an udev rule, otherwise we'll fall back to the command
+        try:
+            self.fd_write = os.open(os.path.join(path, "brightness"), os.O_WRONLY)
+        except OSError:
+            self.fd_write = None
+
+    @property
+    def writable(self):
+        return self.fd_write is not None
+
+    def get(self):
+        """
+        :return: brightness percentage
+        """
+        # sysfs regenerates the attribute on every read at offset 0
+        raw = int(os.pread(self.fd_read, 32, 0))
+        return int(round(raw * 100 / self.max, 0))
+
+    def set(self, percent):
+        raw = int(round(percent * self.max / 100, 0))
+        os.pwrite(self.fd_write, str(raw).encode(), 0)
+
+
+def find_backlight():
+    """
+    :return: Backlight of the preferred device, or None if no device found
+    """
+    try:
+        devices = sorted(os.listdir(sysfs_dir))
+    except OSError:
+        return None
+
+    def rank(name):
+        try:
+            with open(os.path.join(sysfs_dir, name, "type")) as f:
+                return type_preference.index(f.read().strip())
+        except (OSError, ValueError):
+            return len(type_preference)
+
+    for name in sorted(devices, key=rank):
+        try:
+            backlight = Backlight(os.path.join(sysfs_dir, name))
+            if backlight.max > 0:
+                return backlight
+        except (OSError, ValueError) as e:
+            print("Couldn't open backlight '{}': {}".format(name, e))
+
+    return None
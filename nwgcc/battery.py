@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+import os
+from collections import namedtuple
+
+sysfs_dir = "/sys/class/power_supply"
+
+# POWER_SUPPLY_STATUS -> upower-like state names, as displayed before
+states = {
+    "Charging": "charging",
+    "Discharging": "discharging",
+    "Full": "fully-charged",
+    "Not charging": "pending-charge",
+}
+
+# energy values in µWh, rate in µW
+Battery = namedtuple("Battery", ["name", "percentage", "state", "energy_now", "energy_full", "rate"])
+
+
+def read_uevent(name):
+    """
+    :param name: power supply name, e.g. 'BAT0'
+    :return: dict w/o the 'POWER_SUPPLY_' prefix, e.g. {'STATUS': 'Discharging', 'CAPACITY': '87', ...}
+    """
+    values = {}
+    try:
+        with open(os.path.join(sysfs_dir, name, "uevent")) as f:
+            data = f.read()
+    except OSError:
+        return values
+
+    for line in data.splitlines():
+        if "=" in line:
+            key, value = line.split("=", 1)
+            values[key.replace("POWER_SUPPLY_", "", 1)] = value
+
+    return values
+
+
+def as_int(values, key):
+    try:
+        return int(values[key])
+    except (KeyError, ValueError):
+        return None
+
+
+def get_batteries():
+    """
+    :return: list of Battery, for system batteries present (peripheral devices skipped)
+    """
+    batteries = []
+    try:
+        names = sorted(os.listdir(sysfs_dir))
+    except OSError:
+        return batteries
+
+    for name in names:
+        values = read_uevent(name)
+        if values.get("TYPE") != "Battery" or values.get("SCOPE") == "Device" or values.get("PRESENT") == "0":
+            continue
+
+        energy_now, energy_full, rate = as_int(values, "ENERGY_NOW"), as_int(values, "ENERGY_FULL"), as_int(
+            values, "POWER_NOW")
+        if energy_now is None:
+            # charge-based battery: µAh and µA, convert w/ voltage if known
+            voltage = as_int(values, "VOLTAGE_NOW")
+            factor = voltage / 1000000 if voltage else 1
+            charge = [as_int(values, key) for key in ["CHARGE_NOW", "CHARGE_FULL", "CURRENT_NOW"]]
+            energy_now, energy_full, rate = [int(v * factor) if v is not None else None for v in charge]
+
+        percentage = as_int(values, "CAPACITY")
+        if percentage is None and energy_now is not None and energy_full:
+            percentage = int(round(energy_now * 100 / energy_full, 0))
+
+        batteries.append(Battery(name, percentage if percentage is not None else 0,
+                                 states.get(values.get("STATUS"), values.get("STATUS", "unknown").lower()),
+                                 energy_now, energy_full, abs(rate) if rate else rate))
+
+    return batteries
+
+
+def format_time(hours):
+    """
+    upower-like format: '3.2 hours', '45.0 minutes'
+    """
+    if hours >= 1:
+        return "{:.1f} hours".format(hours)
+    return "{:.1f} minutes".format(hours * 60)
+
+
+def remaining_time(state, energy_now, energy_full, rate):
+    """
+    :return: formatted time to empty (if discharging) or to full (if charging), or ''
+    """
+    if not rate or energy_now is None:
+        return ""
+    if state == "discharging":
+        return format_time(energy_now / rate)
+    if state == "charging" and energy_full:
+        return format_time(max(energy_full - energy_now, 0) / rate)
+    return ""
+
+
+def battery_status(batteries):
+    """
+    :param batteries: list of Battery
+    :return: aggregate message (e.g. '87% discharging 3.2 hours'), aggregate percentage, per battery details
+    """
+    if not batteries:
+        return "", 0, ""
+
+    states_found = [b.state for b in batteries]
+    if "discharging" in states_found:
+        state = "discharging"
+    elif "charging" in states_found:
+        state = "charging"
+    else:
+        state = batteries[0].state
+
+    if all(b.energy_now is not None and b.energy_full for b in batteries):
+        energy_now = sum(b.energy_now for b in batteries)
+        energy_full = sum(b.energy_full for b in batteries)
+        perc_val = int(round(energy_now * 100 / energy_full, 0))
+        # batteries are usually drained one by one, the total rate is the sum
+        rate = sum(b.rate for b in batteries if b.rate and b.state == state)
+        time = remaining_time(state, energy_now, energy_full, rate)
+    else:
+        perc_val = int(round(sum(b.percentage for b in batteries) / len(batteries), 0))
+        time = ""
+
+    msg = "{}% {} {}".format(perc_val, state, time).strip()
+
+    details = []
+    for b in batteries:
+        line = "{}: {}% {} {}".format(b.name, b.percentage, b.state,
+                                      remaining_time(b.state, b.energy_now, b.energy_full, b.rate))
+        details.append(line.strip())
+
+    return msg, perc_val, "\n".join(details)
+
+
+def on_battery():
+    """
+    :return: True if no mains adapter is online, and a system battery is discharging
+    """
+    try:
+        names = os.listdir(sysfs_dir)
+    except OSError:
+        return False
+
+    discharging = False
+    for name in names:
+        values = read_uevent(name)
+        if values.get("TYPE") == "Mains" and values.get("ONLINE") == "1":
+            return False
+        if values.get("TYPE") == "Battery" and values.get("SCOPE") != "Device" \
+                and values.get("STATUS") == "Discharging":
+            discharging = True
+
+    return discharging
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+from gi.repository import Gio, GLib
+
+BLUEZ_NAME = "org.bluez"
+ADAPTER_INTERFACE = "org.bluez.Adapter1"
+OBJECT_MANAGER_INTERFACE = "org.freedesktop.DBus.ObjectManager"
+
+
+class BluezAdapter(object):
+    """
+    Bluetooth adapter state read from BlueZ on the system bus. The `Powered` and `Alias` properties are cached
+    by the proxy and kept up to date with PropertiesChanged signals, so reading them costs nothing.
+    BlueZ is never auto-started (D-Bus activation would start bluetoothd) just to display its state.
+    """
+    def __init__(self, bus=None):
+        """
+        :param bus: Gio.DBusConnection, the system bus if None (e.g. a test bus w/ a mock BlueZ service)
+        """
+        self.bus = bus if bus else Gio.bus_get_sync(Gio.BusType.SYSTEM, None)
+        self.proxy = None
+        self.callback = None
+
+        # adapters plugged / unplugged
+        for signal in ["InterfacesAdded", "InterfacesRemoved"]:
+            self.bus.signal_subscribe(BLUEZ_NAME, OBJECT_MANAGER_INTERFACE, signal, "/", None,
+                                      Gio.DBusSignalFlags.NONE, self.on_interfaces_changed)
+
+        self.find_adapter()
+
+    def find_adapter(self):
+        """
+        :return: True if an adapter found; raises GLib.Error if BlueZ is not running
+        """
+        objects = self.bus.call_sync(BLUEZ_NAME, "/", OBJECT_MANAGER_INTERFACE, "GetManagedObjects", None, None,
+                                     Gio.DBusCallFlags.NO_AUTO_START, -1, None).unpack()[0]
+        self.proxy = None
+        for path in sorted(objects):
+            if ADAPTER_INTERFACE in objects[path]:
+                self.proxy = Gio.DBusProxy.new_sync(self.bus, Gio.DBusProxyFlags.DO_NOT_AUTO_START, None,
+                                                    BLUEZ_NAME, path, ADAPTER_INTERFACE, None)
+                self.proxy.connect("g-properties-changed", self.on_properties_changed)
+                break
+
+        return self.proxy is not None
+
+    def watch(self, callback):
+        """
+        Call `callback` in the main loop whenever the adapter state changes
+        """
+        self.callback = callback
+
+    def on_properties_changed(self, proxy, changed, invalidated):
+        if self.callback:
+            self.callback()
+
+    def on_interfaces_changed(self, connection, sender, path, interface, signal, parameters):
+        if ADAPTER_INTERFACE not in parameters.unpack()[1]:
+            return
+        try:
+            self.find_adapter()
+        except GLib.Error as e:
+            print("ERROR: BlueZ: {}".format(e))
+            self.proxy = None
+        if self.callback:
+            self.callback()
+
+    def get_property(self, name):
+        value = self.proxy.get_cached_property(name) if self.proxy else None
+        return value.unpack() if value is not None else None
+
+    def powered(self):
+        return bool(self.get_property("Powered"))
+
+    def name(self):
+        return self.get_property("Alias") or ""
+
+
+def get_adapter(bus=None):
+    """
+    :return: BluezAdapter, or None if BlueZ is not running or no adapter found
+    """
+    try:
+        adapter = BluezAdapter(bus)
+    except GLib.Error as e:
+        print("BlueZ not available: {}".format(e))
+        return None
+
+    return adapter if adapter.proxy else None
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+"""
+A long-lived /bin/sh, that runs commands written to its stdin in batches. Running a pipeline this way costs
+a subshell fork, instead of starting a new shell process (fork & exec & shell initialization) for each command.
+Each command's output goes to a file of its own, so that jobs it leaves running in the background can't write
+into the output of the commands that follow.
+"""
+
+import os
+import re
+import select
+import shlex
+import shutil
+import signal
+import subprocess
+import tempfile
+import time
+
+
+class ShellWorker(object):
+    """
+    Not thread-safe: use one per thread. The shell runs in its own session, killed as a whole if a command
+    exceeds its time limit, and restarted w/ the next batch.
+    """
+    def __init__(self, shell="/bin/sh"):
+        self.shell = shell
+        self.process = None
+        self.buffer = b""
+        # output files, numbered
+        self.dir = None
+        self.count = 0
+        # each command is followed by '\n<token> <exit status>\n' on stdout
+        self.token = "__nwgcc_{}__".format(os.urandom(8).hex())
+        self.marker = re.compile(b"\n" + self.token.encode() + b" (\\d+)\n")
+
+    def start(self):
+        runtime_dir = os.getenv("XDG_RUNTIME_DIR")
+        self.dir = tempfile.mkdtemp(prefix="nwgcc-sh-", dir=runtime_dir if runtime_dir and os.path.isdir(
+            runtime_dir) else None)
+        self.process = subprocess.Popen([self.shell], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        start_new_session=True)
+        self.buffer = b""
+
+    def stop(self):
+        if self.process is None:
+            return
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        self.process.wait()
+        self.process.stdin.close()
+        self.process.stdout.close()
+        self.process = None
+        shutil.rmtree(self.dir, ignore_errors=True)
+        self.dir = None
+
+    def script(self, commands, paths):
+        lines = []
+        for command, path in zip(commands, paths):
+            # in a subshell, so that `cd`, `exit` or variables don't affect the next commands; parsed by `eval`,
+            # so that a syntax error (e.g. unbalanced quotes) fails w/ exit status 2, instead of swallowing the rest
+            # of the script and leaving us waiting for the marker
+            lines.append("( eval {} ) </dev/null >{}".format(shlex.quote(command), shlex.quote(path)))
+            lines.append("printf '\\n%s %d\\n' {} $?".format(self.token))
+
+        return ("\n".join(lines) + "\n").encode()
+
+    def run_batch(self, commands, timeout=None):
+        """
+        :param timeout: per command, in seconds
+        :return: list of (output, exit status, timed out, seconds) tuples; exit status -1 if the command was not
+        run, because the previous one timed out, or the shell died
+        """
+        if self.process is None or self.process.poll() is not None:
+            self.stop()
+            self.start()
+        paths = [os.path.join(self.dir, str(self.count + i)) for i in range(len(commands))]
+        self.count += len(commands)
+        try:
+            self.process.stdin.write(self.script(commands, paths))
+            self.process.stdin.flush()
+        except BrokenPipeError:
+            self.stop()
+            return [("", -1, False, 0.0)] * len(commands)
+
+        results = []
+        fd = self.process.stdout.fileno()
+        start = time.perf_counter()
+        while len(results) < len(commands):
+            match = self.marker.search(self.buffer)
+            if match:
+                now = time.perf_counter()
+                output = self.read_output(paths[len(results)]).decode("utf-8", errors="replace").strip()
+                results.append((output, int(match.group(1)), False, now - start))
+                self.buffer = self.buffer[match.end():]
+                start = now
+                continue
+
+            remaining = start + timeout - time.perf_counter() if timeout else None
+            if remaining is not None and remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                print("ERROR: '{}' timed out after {} s".format(commands[len(results)], timeout))
+                results.append(("", -9, True, time.perf_counter() - start))
+                self.stop()
+                break
+
+            data = os.read(fd, 65536)
+            if not data:
+                print("ERROR: '{}' exited, restarting".format(self.shell))
+                self.stop()
+                break
+            self.buffer += data
+
+        # files of the commands not done are removed w/ the directory, by stop()
+        results += [("", -1, False, 0.0)] * (len(commands) - len(results))
+
+        return results
+
+    @staticmethod
+    def read_output(path):
+        """
+        :return: contents of the output file, which is removed
+        """
+        try:
+            with open(path, "rb") as f:
+                output = f.read()
+            os.unlink(path)
+        except OSError:
+            return b""
+
+        return output
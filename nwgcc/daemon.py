@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+import os
+import socket
+
+from gi.repository import GLib
+
+
+def socket_path():
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "nwgcc.sock")
+    return "/tmp/nwgcc-{}.sock".format(os.getuid())
+
+
+def send_message(message):
+    """
+    Pass `message` to the resident instance, if any
+    :return: True if delivered
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path())
+        sock.sendall(message.encode("utf-8"))
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+class DaemonServer(object):
+    """
+    Listens on the unix socket, passes messages received ('show', 'hide', 'toggle'...) to `handler`
+    in the GLib main loop
+    """
+    def __init__(self, handler):
+        self.handler = handler
+        self.closed = False
+        self.clients = {}
+        self.path = socket_path()
+        # nobody answered send_message, so the socket file (if any) is a leftover
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(self.path)
+        self.sock.listen(4)
+        self.sock.setblocking(False)
+        GLib.io_add_watch(self.sock.fileno(), GLib.PRIORITY_DEFAULT, GLib.IO_IN, self.on_connection)
+
+    def on_connection(self, source, condition):
+        try:
+            connection, address = self.sock.accept()
+        except BlockingIOError:
+            return True
+
+        # never block the main loop on a client
+        connection.setblocking(False)
+        watch = GLib.io_add_watch(connection.fileno(), GLib.PRIORITY_DEFAULT, GLib.IO_IN | GLib.IO_HUP | GLib.IO_ERR,
+                                  self.on_readable, connection)
+        # one that neither sends, nor closes the connection
+        timeout = GLib.timeout_add_seconds(1, self.drop, connection)
+        # connection: [data received, io watch, timeout] GLib source ids
+        self.clients[connection] = [b"", watch, timeout]
+
+        return True
+
+    def on_readable(self, source, condition, connection):
+        try:
+            data = connection.recv(64)
+        except BlockingIOError:
+            return True
+        except OSError:
+            data = b""
+        # the message ends w/ the connection, 64 bytes at most
+        if data and len(self.clients[connection][0] + data) < 64:
+            self.clients[connection][0] += data
+            return True
+
+        message = (self.clients[connection][0] + data).decode("utf-8", errors="replace").strip()
+        self.drop(connection)
+        if message:
+            self.handler(message)
+
+        return False
+
+    def drop(self, connection):
+        data, watch, timeout = self.clients.pop(connection)
+        for source_id in [watch, timeout]:
+            source = GLib.main_context_default().find_source_by_id(source_id)
+            if source and not source.is_destroyed():
+                source.destroy()
+        connection.close()
+        # remove the timeout source
+        return False
+
+    def close(self):
+        self.closed = True
+        for connection in list(self.clients):
+            self.drop(connection)
+        self.sock.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+import threading
+import queue
+
+from gi.repository import GLib
+
+from nwgcc import trace
+
+
+def probe_name(probe):
+    """
+    :return: e.g. 'BatteryRow.probe' for a bound method, the same for all the instances, to name trace spans
+    """
+    owner = getattr(probe, "__self__", None)
+    if owner is not None:
+        return "{}.{}".format(type(owner).__name__, probe.__name__)
+    return getattr(probe, "__qualname__", str(probe))
+
+
+class ProbeEngine(object):
+    """
+    Runs probes (functions that may block, e.g. on a subprocess) in a pool of worker threads,
+    and passes their results back to callbacks in the GTK main loop, via GLib.idle_add.
+    """
+    def __init__(self, workers=4, name="probe"):
+        self.jobs = queue.Queue()
+        # keys of probes submitted, but not yet delivered; only accessed from the main loop
+        self.pending = set()
+        # probes requested while the previous one of the same key was running
+        self.requested = {}
+        for i in range(workers):
+            thread = threading.Thread(target=self.work, name="nwgcc-{}-{}".format(name, i), daemon=True)
+            thread.start()
+
+    def submit(self, key, probe, callback, *args):
+        """
+        Schedule `probe(*args)`, `callback(result)` will be called in the main loop
+        :param key: hashable; if a probe of the same key is still running, the request is postponed
+        until it's done, and merged with other requests of the same key
+        :return: True if the probe has been scheduled
+        """
+        if key in self.pending:
+            self.requested[key] = (probe, callback, args)
+            return False
+        self.pending.add(key)
+        self.jobs.put((key, probe, callback, args))
+        return True
+
+    def work(self):
+        while True:
+            key, probe, callback, args = self.jobs.get()
+            try:
+                with trace.span(probe_name(probe), "probe"):
+                    result = probe(*args)
+            except Exception as e:
+                print("ERROR: probe '{}' failed: {}".format(probe_name(probe), e))
+                GLib.idle_add(self.deliver, key, None, None)
+                continue
+            GLib.idle_add(self.deliver, key, callback, result)
+
+    def deliver(self, key, callback, result):
+        self.pending.discard(key)
+        if callback:
+            callback(result)
+        if key in self.requested:
+            probe, callback, args = self.requested.pop(key)
+            self.submit(key, probe, callback, *args)
+        # remove the idle source
+        return False
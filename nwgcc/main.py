@@ -9,98 +9,227 @@ License: GPL-3.0-or-later
 """
 
 import time
-time_start = int(round(time.time() * 1000))
+time_start = time.perf_counter()
 import gi
 import sys
 import argparse
+import signal
 
 gi.require_version('Gdk', '3.0')
 from gi.repository import Gdk, GLib
 
 from nwgcc.tools import *
-from nwgcc.preferences import PreferencesWindow
+from nwgcc.engine import ProbeEngine
+from nwgcc.backlight import find_backlight
+from nwgcc.battery import get_batteries, battery_status, on_battery
+from nwgcc.mpris import get_watcher
+from nwgcc.bluez import get_adapter
+from nwgcc.wifi import wireless_interfaces, wifi_status, watch_links
+from nwgcc.daemon import DaemonServer, send_message
+from nwgcc.scheduler import RefreshScheduler
+from nwgcc.store import Store, CLI_PREFIX
+from nwgcc import uevent, trace, stats, runner
 
 shared.dirname = os.path.dirname(__file__)
-data_dir = get_data_dir()
-commands_dir = os.path.join(data_dir, "commands")
-config_dir = get_config_dir(data_dir)
-
-# Copy default files if not found
-init_config_files(os.path.join(shared.dirname, "configs"), config_dir)
-copy_files(os.path.join(shared.dirname, "icons_light"), os.path.join(data_dir, "icons_light"))
-copy_files(os.path.join(shared.dirname, "icons_dark"), os.path.join(data_dir, "icons_dark"))
-
-# Init dictionaries from ~/.config/nwgcc/config.json
-config_data = load_json(os.path.join(config_dir, "config.json"))
-
-if "custom_rows" in config_data:
-    CUSTOM_ROWS: dict = config_data["custom_rows"]
-else:
-    CUSTOM_ROWS = {}
-
-if "buttons" in config_data:
-    BUTTONS: dict = config_data["buttons"]
-else:
-    BUTTONS = {}
-
-# Load preferences, icon and command definitions from ~/.local/share/nwgcc/preferences.json
-# Check the file presence and validity first
-pref: dict = init_preferences(os.path.join(shared.dirname, "preferences/preferences.json"),
-                              os.path.join(data_dir, "preferences.json"))
-preferences: dict = pref["preferences"]
-
-if "icons" in pref:
-    ICONS: dict = pref["icons"]
-else:
-    ICONS = {}
-    print("ERROR: Icons dictionary missing from '{}'".format(os.path.join(config_dir, "config.json")))
-
-if "commands" in pref:
-    COMMANDS: dict = pref["commands"]
-else:
-    COMMANDS = {}
-    print("ERROR: Commands dictionary missing from '{}'".format(os.path.join(config_dir, "config.json")))
-
-# if path left empty, we use GTK icons
-if preferences["icon_set"] == "light":
-    shared.icons_path = os.path.join(data_dir, "icons_light")
-elif preferences["icon_set"] == "dark":
-    shared.icons_path = os.path.join(data_dir, "icons_dark")
-
-# Init user-defined CLI commands list from the plain text file
-CLI_COMMANDS: list = parse_cli_commands(os.path.join(config_dir, "cli_commands"))
-
-shared.icon_theme = Gtk.IconTheme.get_default()
+
+# Set in load_config(), after arguments have been parsed
+data_dir = ""
+config_dir = ""
+config_data: dict = {}
+CUSTOM_ROWS: dict = {}
+BUTTONS: dict = {}
+pref: dict = {}
+preferences: dict = {}
+ICONS: dict = {}
+COMMANDS: dict = {}
+CLI_COMMANDS: list = []
+
+# (phase name, start, end) in time.perf_counter() seconds
+startup_phases = []
+phase_start = time_start
+
+
+def end_phase(name):
+    """
+    Record the time elapsed since the previous start-up phase ended
+    """
+    global phase_start
+    now = time.perf_counter()
+    startup_phases.append((name, phase_start, now))
+    trace.complete(name, "startup", phase_start, now)
+    phase_start = now
+
+
+def defaults_stamp():
+    """
+    Modification times of the default files shipped w/ the package; they change whenever nwgcc gets (re)installed
+    """
+    paths = ["configs/config.json", "configs/cli_commands", "configs/style.css", "icons_light", "icons_dark",
+             "preferences/preferences.json"]
+    return " ".join([str(file_mtime(os.path.join(shared.dirname, path))) for path in paths])
+
+
+def provision():
+    """
+    Copy default files if not found, add new preferences keys. Skipped if the defaults have not changed
+    since the last time, and the files are still there.
+    :return: True if done
+    """
+    stamp_file = os.path.join(data_dir, "defaults-stamp")
+    stamp = defaults_stamp()
+    try:
+        with open(stamp_file) as f:
+            if f.read() == stamp \
+                    and os.path.isfile(os.path.join(data_dir, "preferences.json")) \
+                    and all(os.path.isfile(os.path.join(config_dir, name)) for name in
+                            ["config.json", "cli_commands", "style.css"]) \
+                    and os.listdir(os.path.join(data_dir, "icons_light")) \
+                    and os.listdir(os.path.join(data_dir, "icons_dark")):
+                return False
+    except OSError:
+        pass
+
+    # Copy default files if not found
+    init_config_files(os.path.join(shared.dirname, "configs"), config_dir)
+    copy_files(os.path.join(shared.dirname, "icons_light"), os.path.join(data_dir, "icons_light"))
+    copy_files(os.path.join(shared.dirname, "icons_dark"), os.path.join(data_dir, "icons_dark"))
+    # Check the preferences file presence and validity
+    init_preferences(os.path.join(shared.dirname, "preferences/preferences.json"),
+                     os.path.join(data_dir, "preferences.json"))
+
+    save_string(stamp, stamp_file)
+    return True
+
+
+def load_config():
+    global config_data, CUSTOM_ROWS, BUTTONS, pref, preferences, ICONS, COMMANDS, CLI_COMMANDS
+
+    # Init dictionaries from ~/.config/nwgcc/config.json
+    config_data = load_json(os.path.join(config_dir, "config.json"))
+
+    if "custom_rows" in config_data:
+        CUSTOM_ROWS = config_data["custom_rows"]
+    else:
+        CUSTOM_ROWS = {}
+
+    if "buttons" in config_data:
+        BUTTONS = config_data["buttons"]
+    else:
+        BUTTONS = {}
+
+    # Load preferences, icon and command definitions from ~/.local/share/nwgcc/preferences.json
+    pref = load_json(os.path.join(data_dir, "preferences.json"))
+    # provisioning (which adds new keys to the file) may have been skipped
+    add_missing_preferences(pref, load_json(os.path.join(shared.dirname, "preferences/preferences.json")))
+    preferences = pref["preferences"]
+
+    if "icons" in pref:
+        ICONS = pref["icons"]
+    else:
+        ICONS = {}
+        print("ERROR: Icons dictionary missing from '{}'".format(os.path.join(config_dir, "config.json")))
+
+    if "commands" in pref:
+        COMMANDS = pref["commands"]
+    else:
+        COMMANDS = {}
+        print("ERROR: Commands dictionary missing from '{}'".format(os.path.join(config_dir, "config.json")))
+
+    # if path left empty, we use GTK icons
+    if preferences["icon_set"] == "light":
+        shared.icons_path = os.path.join(data_dir, "icons_light")
+    elif preferences["icon_set"] == "dark":
+        shared.icons_path = os.path.join(data_dir, "icons_dark")
+
+    # Init user-defined CLI commands list from the plain text file
+    CLI_COMMANDS = [parse_cli_line(line) for line in parse_cli_commands(os.path.join(config_dir, "cli_commands"))]
 
 
 def launch_from_row(widget, event, cmd):
-    print("Executing '{}'".format(cmd))
-    subprocess.Popen('exec {}'.format(cmd), shell=True)
+    launch_command(cmd)
     if not preferences["dont_close"]:
-        GLib.timeout_add(50, Gtk.main_quit)
+        GLib.timeout_add(50, close_window, widget.get_toplevel())
+
+
+def close_window(window):
+    """
+    Quit, or just hide the window if running as a daemon
+    """
+    if shared.args.daemon:
+        window.hide()
+    else:
+        Gtk.main_quit()
+
+
+def cli_key(i):
+    return "{}{}".format(CLI_PREFIX, i)
 
 
 class CliLabel(Gtk.Label):
+    """
+    Lines are run in parallel, each replaced as soon as it's done. Until then, the last known output (saved
+    in the cache dir) is displayed.
+    """
     def __init__(self):
         Gtk.Label.__init__(self)
         self.set_justify(Gtk.Justification.CENTER)
         self.set_property("name", "cli-label")
-        self.update()
+        self.cache_file = os.path.join(shared.cache_dir, "cli_output.json")
+        cached = load_json(self.cache_file) if os.path.isfile(self.cache_file) else {}
+        shared.store.update({cli_key(i): cached.get(cli_command.command, "")
+                             for i, cli_command in enumerate(CLI_COMMANDS)})
+        self.set_text(self.format())
+        shared.store.subscribe([cli_key(i) for i in range(len(CLI_COMMANDS))], self.render)
+
+        for i in range(len(CLI_COMMANDS)):
+            self.run(i)
+
+    def intervals(self):
+        """
+        :return: (milliseconds, line index) of lines annotated w/ '# @every <interval>', that have their own timers
+        """
+        return [(max(int(cli_command.every * 1000), 100), i) for i, cli_command in enumerate(CLI_COMMANDS)
+                if cli_command.every]
 
     def update(self):
-        output = ""
+        for i, cli_command in enumerate(CLI_COMMANDS):
+            if not cli_command.every:
+                self.run(i)
+
+    def run(self, i):
+        shared.cli_engine.submit(("cli", i), run_cli_command, lambda output: self.apply(i, output), CLI_COMMANDS[i])
+        # keep the timer, if called from one
+        return True
+
+    def apply(self, i, output):
+        # timed out: keep the last known output
+        if output is not None:
+            shared.store.update({cli_key(i): output})
+
+    def render(self):
+        self.set_text(self.format())
+        outputs = {cli_command.command: shared.store.get(cli_key(i)) for i, cli_command in enumerate(CLI_COMMANDS)}
+        try:
+            save_json(outputs, self.cache_file)
+        except OSError as e:
+            print("ERROR: couldn't save '{}': {}".format(self.cache_file, e))
+
+    def format(self):
+        lines = []
         for i in range(len(CLI_COMMANDS)):
-            command = CLI_COMMANDS[i]
-            o = cmd2string(command)
-            if len(o) > 38:
-                o = "{}…".format(o[0:38])
-            output += o
-            if i < len(CLI_COMMANDS) - 1:
-                output += "\n"
-        self.set_text(output)
+            output = shared.store.get(cli_key(i)) or ""
+            if len(output) > 38:
+                output = "{}…".format(output[0:38])
+            lines.append(output)
+
+        return "\n".join(lines)
 
 
 class CustomRow(Gtk.EventBox):
+    """
+    Rows that display system state probe() it in a worker thread, pass the results to the state store,
+    and subscribe render() to the keys they display
+    """
     def __init__(self, name, cmd="", icon=""):
         self.name = name
         self.icon = icon
@@ -130,10 +259,34 @@ class CustomRow(Gtk.EventBox):
 
         self.style_context = self.hbox.get_style_context()
         self.set_css_name("menuitem")
+        # RowTimer, if polled w/ an adaptive interval
+        self.timer = None
 
     def update(self):
+        # probe in a worker thread, apply results in the main loop
+        shared.engine.submit(self, self.probe, self.apply)
+
+    def probe(self):
+        """
+        :return: {state key: value}
+        """
+        return {}
+
+    def apply(self, values):
+        if self.timer:
+            self.timer.result(values)
+        shared.store.update(values)
+
+    def get_values(self):
+        """
+        :return: label text and icon, from the state store
+        """
+        return self.name, self.icon
+
+    def render(self):
         self.name, self.icon = self.get_values()
-        self.label.set_text(self.name)
+        if self.name != self.label.get_text():
+            self.label.set_text(self.name)
         if self.icon != self.old_icon:
             pixbuf = create_pixbuf(self.icon, preferences["icon_size_small"]) if self.icon else None
             self.image.set_from_pixbuf(pixbuf)
@@ -153,28 +306,57 @@ class CustomRow(Gtk.EventBox):
 
 
 class UserRow(CustomRow):
-    def __init__(self, cmd=preferences["on-click-user"]):
-        icon = ICONS["user"] if "user" in ICONS else ""
-        name = "{}@{}".format(cmd2string(COMMANDS["get_user"]), cmd2string(COMMANDS["get_host"]))
+    def __init__(self, cmd=None):
+        cmd = preferences["on-click-user"] if cmd is None else cmd
+        shared.store.update(self.probe())
+        name, icon = self.get_values()
         super().__init__(name, cmd, icon)
+        shared.store.subscribe(["user"], self.render)
 
-    def update(self):
-        name = "{}@{}".format(cmd2string(COMMANDS["get_user"]), cmd2string(COMMANDS["get_host"]))
-        self.label.set_text(name)
+    def probe(self):
+        user, host = run_batch([COMMANDS["get_user"], COMMANDS["get_host"]])
+        return {"user": "{}@{}".format(user.output, host.output)}
+
+    def get_values(self):
+        name = shared.store.get("user") or ""
+        icon = ICONS["user"] if "user" in ICONS else ""
+        return name, icon
 
 
 class BatteryRow(CustomRow):
-    def __init__(self, cmd=preferences["on-click-battery"]):
+    def __init__(self, cmd=None, command=""):
+        cmd = preferences["on-click-battery"] if cmd is None else cmd
+        # if no command given, we read /sys/class/power_supply
+        self.command = command
+        shared.store.update(self.probe())
         name, icon = self.get_values()
         super().__init__(name, cmd, icon)
+        self.set_tooltip_text(shared.store.get("battery_details"))
+        shared.store.subscribe(["battery", "battery_level", "battery_details"], self.render)
+
+        if not self.command:
+            # charger plugged / unplugged, battery state changed
+            uevent.connect("power_supply", self.on_uevent)
+
+    def on_uevent(self, event):
+        self.update()
+
+    def probe(self):
+        details = ""
+        if self.command:
+            name, perc_val = get_battery(self.command)
+        else:
+            name, perc_val, details = battery_status(get_batteries())
+        return {"battery": name, "battery_level": perc_val, "battery_details": details or None}
+
+    def render(self):
+        super().render()
+        details = shared.store.get("battery_details")
+        if details != self.get_tooltip_text():
+            self.set_tooltip_text(details)
 
     def get_values(self):
-        name = ""
-        perc_val = 0
-        if is_command(COMMANDS["get_battery"]):
-            name, perc_val = get_battery(COMMANDS["get_battery"])
-        elif is_command(COMMANDS["get_battery_alt"]):
-            name, perc_val = get_battery(COMMANDS["get_battery_alt"])
+        perc_val = shared.store.get("battery_level") or 0
         if perc_val > 95:
             icon = ICONS["battery-full"] if "battery-full" in ICONS else "icon-missing"
         elif perc_val > 50:
@@ -183,22 +365,34 @@ class BatteryRow(CustomRow):
             icon = ICONS["battery-low"] if "battery-low" in ICONS else "icon-missing"
         else:
             icon = ICONS["battery-empty"] if "battery-empty" in ICONS else "icon-missing"
-        return name, icon
+        return shared.store.get("battery") or "", icon
 
 
 class WifiRow(CustomRow):
-    def __init__(self, cmd=preferences["on-click-wifi"]):
+    def __init__(self, cmd=None, interfaces=None):
+        cmd = preferences["on-click-wifi"] if cmd is None else cmd
+        # wireless interfaces to query in-process; if none, we use the 'get_ssid' command
+        self.interfaces = interfaces
+        shared.store.update(self.probe())
         name, icon = self.get_values()
         super().__init__(name, cmd, icon)
+        shared.store.subscribe(["ssid", "wifi_signal"], self.render)
 
-    def get_values(self):
-        ssid = ""
-        try:
+        # if True, SSID changes come with link notifications, only the signal level needs (slow) polling
+        self.event_driven = bool(self.interfaces) and watch_links(self.update)
+
+    def probe(self):
+        ssid, signal = "", None
+        if self.interfaces:
+            ssid, signal = wifi_status(self.interfaces)
+        else:
             ssid = cmd2string(COMMANDS["get_ssid"])
-        except:
-            pass
+        return {"ssid": ssid, "wifi_signal": signal}
+
+    def get_values(self):
+        ssid, signal = shared.store.get("ssid"), shared.store.get("wifi_signal")
         if ssid:
-            name = ssid
+            name = ssid if signal is None else "{} {}%".format(ssid, signal)
             icon = ICONS["wifi-on"] if "wifi-on" in ICONS else "icon-missing"
         else:
             name = "disconnected"
@@ -208,13 +402,30 @@ class WifiRow(CustomRow):
 
 
 class BluetoothRow(CustomRow):
-    def __init__(self, cmd=preferences["on-click-bluetooth"]):
+    def __init__(self, cmd=None, adapter=None):
+        cmd = preferences["on-click-bluetooth"] if cmd is None else cmd
+        # BlueZ over D-Bus; if None, we use the 'get_bt_status' and 'get_bt_name' commands
+        self.adapter = adapter
+        shared.store.update(self.probe())
         name, icon = self.get_values()
         super().__init__(name, cmd, icon)
+        shared.store.subscribe(["bt_powered", "bt_name"], self.render)
+
+        # if True, no need to poll
+        self.event_driven = self.adapter is not None
+        if self.adapter:
+            self.adapter.watch(self.update)
+
+    def probe(self):
+        if self.adapter:
+            powered, name = self.adapter.powered(), self.adapter.name()
+        else:
+            powered, name = bt_status(COMMANDS["get_bt_status"], COMMANDS["get_bt_name"])
+        return {"bt_powered": powered, "bt_name": name}
 
     def get_values(self):
-        if bt_on(COMMANDS["get_bt_status"]):
-            name = bt_name(COMMANDS["get_bt_name"])
+        if shared.store.get("bt_powered"):
+            name = shared.store.get("bt_name") or ""
             icon = ICONS["bt-on"] if "bt-on" in ICONS else "icon-missing"
         else:
             name = "disabled"
@@ -223,62 +434,191 @@ class BluetoothRow(CustomRow):
         return name, icon
 
 
-class VolumeRow(Gtk.HBox):
+class SliderRow(Gtk.HBox):
+    """
+    Icon and a slider, that writes to hardware only when moved by the user. Writes are done in the probe engine
+    threads, not more often than every 'slider_write_millis'; values the slider passed by meanwhile are skipped.
+    """
     def __init__(self):
         Gtk.HBox.__init__(self)
-        vol, icon = self.get_values()
+        self.scale = Gtk.Scale.new_with_range(orientation=Gtk.Orientation.HORIZONTAL, min=0, max=100, step=1)
+        self.handler_id = self.scale.connect("value-changed", self.on_value_changed)
+        self.scale.connect("button-press-event", self.on_button_press)
+        self.scale.connect("button-release-event", self.on_button_release)
+        self.dragging = False
+        # latest value not written yet, or None
+        self.requested = None
+        self.write_timer = None
+        self.last_write = 0
+        # writes scheduled, and completed; results of probes started before the latest write are outdated
+        self.writes = 0
+        self.written = 0
+        # set_value calls from probe results, and ones skipped as the value has not changed
+        self.updates = 0
+        self.unchanged = 0
+        # RowTimer, if polled w/ an adaptive interval
+        self.timer = None
+
+    def on_value_changed(self, widget):
+        self.requested = self.scale.get_value()
+        # user's here, let's be responsive
+        if self.timer:
+            self.timer.reset()
+        if self.write_timer is None:
+            wait = self.last_write + preferences["slider_write_millis"] / 1000 - time.perf_counter()
+            self.write_timer = GLib.timeout_add(max(int(wait * 1000), 0), self.flush)
+
+    def on_button_press(self, widget, event):
+        self.dragging = True
+        return False
+
+    def on_button_release(self, widget, event):
+        self.dragging = False
+        # write the final position right away
+        if self.write_timer is not None:
+            GLib.source_remove(self.write_timer)
+        self.flush()
+        return False
+
+    def flush(self):
+        self.write_timer = None
+        if self.requested is not None:
+            self.writes += 1
+            self.last_write = time.perf_counter()
+            # if the previous write is still running, the engine replaces the value waiting for it w/ this one
+            shared.engine.submit(("write", self), self.write_probe, self.on_written, self.requested, self.writes)
+            self.requested = None
+        # remove the timeout source
+        return False
+
+    def write_probe(self, value, writes):
+        try:
+            self.write(value)
+        except Exception as e:
+            print("ERROR: couldn't set {}: {}".format(type(self).__name__, e))
+        return writes
+
+    def on_written(self, writes):
+        self.written = writes
+        self.update()
+
+    def write(self, value):
+        pass
+
+    def outdated(self, writes):
+        """
+        :return: True if probe results would move the slider away from the position being written
+        """
+        return writes != self.writes or self.written != self.writes or self.requested is not None or self.dragging
+
+    def set_scale(self, value):
+        """
+        Move the slider w/o triggering a write
+        """
+        if round(value) == round(self.scale.get_value()):
+            self.unchanged += 1
+            return
+        self.updates += 1
+        self.scale.handler_block(self.handler_id)
+        self.scale.set_value(value)
+        self.scale.handler_unblock(self.handler_id)
+
+    def update(self):
+        shared.engine.submit(self, self.probe, self.apply, self.writes)
+
+    def probe(self, writes):
+        return writes, self.read()
+
+    def read(self):
+        """
+        :return: {state key: value}
+        """
+        return {}
+
+    def apply(self, result):
+        writes, values = result
+        if self.outdated(writes):
+            return
+        if self.timer:
+            self.timer.result(values)
+        shared.store.update(values)
+
+    def counters(self):
+        return "{} writes, {} slider updates, {} unchanged".format(self.writes, self.updates, self.unchanged)
+
+
+class VolumeRow(SliderRow):
+    def __init__(self):
+        SliderRow.__init__(self)
+        # may import pyalsa, which we only need if the slider is shown
+        from nwgcc.mixer import get_mixer
+        self.mixer = get_mixer(COMMANDS)
+        shared.store.update(self.read())
+        vol, icon = shared.store.get("volume"), self.get_icon()
         self.old_icon = icon
         self.play_pause_icon = ICONS["media-playback-start"]
         self.play_pause_image = None
+        self.play_pause_box = None
+        self.player = None
+        # 'Artist - Title', packed by the window below the row
+        self.now_playing = Gtk.Label()
+        self.now_playing.set_property("name", "now-playing")
+        self.now_playing.set_no_show_all(True)
         pixbuf = create_pixbuf(icon, preferences["icon_size_small"]) if icon else None
         if pixbuf:
             self.image = Gtk.Image.new_from_pixbuf(pixbuf)
             self.pack_start(self.image, False, False, 5)
 
-        self.scale = Gtk.Scale.new_with_range(orientation=Gtk.Orientation.HORIZONTAL, min=0, max=100, step=1)
-        self.scale.connect("value-changed", self.set_volume)
         if vol is not None:
-            self.scale.set_value(vol)
+            self.set_scale(vol)
         else:
-            self.scale.set_value(0)
             self.scale.set_sensitive(False)
         self.pack_start(self.scale, True, True, 5)
 
-        if preferences["show_playerctl"] and is_command(COMMANDS["playerctl"]):
+        if preferences["show_playerctl"]:
+            self.player = get_watcher(self.on_player_changed)
+
+        if self.player:
             icon = ICONS["media-skip-backward"]
             pixbuf = create_pixbuf(icon, preferences["icon_size_small"]) if icon else None
             image = Gtk.Image.new_from_pixbuf(pixbuf)
             eb = Gtk.EventBox()
             eb.add(image)
-            eb.connect('button-press-event', self.playerctl, "previous")
+            eb.connect('button-press-event', self.media_command, "Previous")
             self.pack_start(eb, False, False, 4)
 
-            if self.playerctl_status() == "Paused" or self.playerctl_status() == "Stopped":
-                self.play_pause_icon = ICONS["media-playback-start"]
-            else:
-                self.play_pause_icon = ICONS["media-playback-pause"]
             pixbuf = create_pixbuf(self.play_pause_icon, preferences["icon_size_small"]) if icon else None
             self.play_pause_image = Gtk.Image.new_from_pixbuf(pixbuf)
-            eb = Gtk.EventBox()
-            eb.add(self.play_pause_image)
-            eb.connect('button-press-event', self.playerctl, "play-pause")
-            self.pack_start(eb, False, False, 4)
+            self.play_pause_box = Gtk.EventBox()
+            self.play_pause_box.add(self.play_pause_image)
+            self.play_pause_box.connect('button-press-event', self.media_command, "PlayPause")
+            self.pack_start(self.play_pause_box, False, False, 4)
 
             icon = ICONS["media-skip-forward"]
             pixbuf = create_pixbuf(icon, preferences["icon_size_small"]) if icon else None
             image = Gtk.Image.new_from_pixbuf(pixbuf)
             eb = Gtk.EventBox()
             eb.add(image)
-            eb.connect('button-press-event', self.playerctl, "next")
+            eb.connect('button-press-event', self.media_command, "Next")
             self.pack_start(eb, False, False, 4)
 
-    def set_volume(self, widget):
-        vol = self.scale.get_value()
-        set_volume(vol, COMMANDS["set_volume_alt"])
-        self.update()
+            self.on_player_changed(*self.player.state())
+            self.render_player()
+            shared.store.subscribe(["player_status", "now_playing"], self.render_player)
 
-    def update(self):
-        vol, icon = self.get_values()
+        shared.store.subscribe(["volume", "muted"], self.render)
+        # if True, no need to poll the volume level
+        self.event_driven = self.mixer.watch(self.update)
+
+    def write(self, value):
+        self.mixer.set(value)
+
+    def read(self):
+        vol, switch = self.mixer.get()
+        return {"volume": vol, "muted": not switch}
+
+    def render(self):
+        vol, icon = shared.store.get("volume"), self.get_icon()
         if icon != self.old_icon:
             pixbuf = create_pixbuf(icon, preferences["icon_size_small"]) if icon else None
             if pixbuf:
@@ -286,25 +626,36 @@ class VolumeRow(Gtk.HBox):
                 self.old_icon = icon
 
         if vol is not None:
-            self.scale.set_value(vol)
+            self.set_scale(vol)
         else:
-            self.scale.set_value(0)
+            self.set_scale(0)
             self.scale.set_sensitive(False)
 
-        if preferences["show_playerctl"]:
-            if self.playerctl_status() == "Playing":
-                icon = ICONS["media-playback-pause"]
-            else:
-                icon = ICONS["media-playback-start"]
-            if icon != self.play_pause_icon:
-                self.play_pause_icon = icon
-                pixbuf = create_pixbuf(icon, preferences["icon_size_small"]) if icon else None
-                if self.play_pause_image:
-                    self.play_pause_image.set_from_pixbuf(pixbuf)
+    def on_player_changed(self, status, title, artist):
+        text = " - ".join([t for t in [artist, title] if t])
+        shared.store.update({"player_status": status, "now_playing": text})
 
-    def get_values(self):
-        vol, switch = get_volume(COMMANDS["get_volume_alt"])
-        if switch:
+    def render_player(self):
+        if shared.store.get("player_status") == "Playing":
+            icon = ICONS["media-playback-pause"]
+        else:
+            icon = ICONS["media-playback-start"]
+        if icon != self.play_pause_icon:
+            self.play_pause_icon = icon
+            pixbuf = create_pixbuf(icon, preferences["icon_size_small"]) if icon else None
+            self.play_pause_image.set_from_pixbuf(pixbuf)
+
+        text = shared.store.get("now_playing") or ""
+        self.play_pause_box.set_tooltip_text(text if text else None)
+        if len(text) > 38:
+            text = "{}…".format(text[0:38])
+        if text != self.now_playing.get_text():
+            self.now_playing.set_text(text)
+        self.now_playing.set_visible(bool(text))
+
+    def get_icon(self):
+        vol = shared.store.get("volume")
+        if not shared.store.get("muted"):
             if vol is not None:
                 if vol > 70:
                     icon = ICONS["volume-high"] if "volume-high" in ICONS else "icon-missing"
@@ -317,47 +668,62 @@ class VolumeRow(Gtk.HBox):
         else:
             icon = ICONS["volume-muted"] if "volume-low" in ICONS else "icon-missing"
 
-        return vol, icon
-
-    def playerctl_status(self):
-        return cmd2string("playerctl status /dev/null 2>&1")
+        return icon
 
-    def playerctl(self, widget, event, cmd):
-        subprocess.call("playerctl {} /dev/null 2>&1".format(cmd), shell=True)
+    def media_command(self, widget, event, method):
+        self.player.command(method)
 
 
-class BrightnessRow(Gtk.HBox):
-    def __init__(self):
-        Gtk.HBox.__init__(self)
-        bri, icon = self.get_values()
+class BrightnessRow(SliderRow):
+    def __init__(self, backlight=None):
+        SliderRow.__init__(self)
+        # native sysfs backend; if None, we use the 'get_brightness' and 'set_brightness' commands
+        self.backlight = backlight
+        shared.store.update(self.read())
+        bri, icon = shared.store.get("brightness"), self.get_icon()
         self.old_icon = icon
         pixbuf = create_pixbuf(icon, preferences["icon_size_small"]) if icon else None
         if pixbuf:
             self.image = Gtk.Image.new_from_pixbuf(pixbuf)
             self.pack_start(self.image, False, False, 5)
 
-        self.scale = Gtk.Scale.new_with_range(orientation=Gtk.Orientation.HORIZONTAL, min=0, max=100, step=1)
-        self.scale.connect("value-changed", self.set_brightness)
-        self.scale.set_value(bri)
+        self.set_scale(bri)
         self.pack_start(self.scale, True, True, 5)
+        shared.store.subscribe(["brightness"], self.render)
 
-    def set_brightness(self, widget):
-        bri = self.scale.get_value()
-        set_brightness(COMMANDS["set_brightness"], bri)
-        self.update()
+        if self.backlight:
+            # brightness changed with hotkeys
+            uevent.connect("backlight", self.on_uevent)
 
-    def update(self):
-        bri, icon = self.get_values()
+    def on_uevent(self, event):
+        if event.get("DEVPATH", "").endswith("/" + self.backlight.name):
+            self.update()
+
+    def write(self, value):
+        if self.backlight and self.backlight.writable:
+            self.backlight.set(value)
+        else:
+            set_brightness(COMMANDS["set_brightness"], value)
+
+    def read(self):
+        if self.backlight:
+            bri = self.backlight.get()
+        else:
+            bri = get_brightness(COMMANDS["get_brightness"])
+        return {"brightness": bri}
+
+    def render(self):
+        bri, icon = shared.store.get("brightness"), self.get_icon()
         if icon != self.old_icon:
             pixbuf = create_pixbuf(icon, preferences["icon_size_small"]) if icon else None
             if pixbuf:
                 self.image.set_from_pixbuf(pixbuf)
             self.old_icon = icon
 
-        self.scale.set_value(bri)
+        self.set_scale(bri)
 
-    def get_values(self):
-        bri = get_brightness(COMMANDS["get_brightness"])
+    def get_icon(self):
+        bri = shared.store.get("brightness") or 0
         if bri > 70:
             icon = ICONS["brightness-high"] if "brightness-high" in ICONS else "icon-missing"
         elif bri > 30:
@@ -365,7 +731,7 @@ class BrightnessRow(Gtk.HBox):
         else:
             icon = ICONS["brightness-low"] if "brightness-low" in ICONS else "icon-missing"
 
-        return bri, icon
+        return icon
 
 
 class CustomButton(Gtk.Button):
@@ -382,12 +748,11 @@ class CustomButton(Gtk.Button):
 
     def launch(self, widget, cmd):
         if cmd:
-            print("Executing '{}'".format(cmd))
-            subprocess.Popen('exec {}'.format(cmd), shell=True)
+            launch_command(cmd)
         else:
             print("No command assigned")
         if not preferences["dont_close"] and cmd:
-            GLib.timeout_add(50, Gtk.main_quit)
+            GLib.timeout_add(50, close_window, self.get_toplevel())
 
 
 class PreferencesButton(CustomButton):
@@ -403,6 +768,7 @@ class PreferencesButton(CustomButton):
         self.connect("clicked", self.launch)
 
     def launch(self, widget):
+        from nwgcc.preferences import PreferencesWindow
         preferences_window = PreferencesWindow(pref,
                                                os.path.join(data_dir, "preferences.json"),
                                                os.path.join(config_dir, "cli_commands"),
@@ -428,6 +794,7 @@ class MyWindow(Gtk.Window):
             self.set_position(Gtk.WindowPosition.MOUSE)
 
         self.connect("key-release-event", self.handle_keyboard)
+        self.connect("delete-event", self.on_delete_event)
 
         self.init_ui()
 
@@ -452,13 +819,18 @@ class MyWindow(Gtk.Window):
             sep = Gtk.Separator(orientation=Gtk.Orientation.HORIZONTAL)
             v_box.pack_start(sep, True, True, 6)
 
-        if preferences["show_brightness_slider"] and is_command(COMMANDS["get_brightness"]):
-            self.brightness_row = BrightnessRow()
-            v_box.pack_start(self.brightness_row, True, True, 0)
+        if preferences["show_brightness_slider"]:
+            backlight = find_backlight()
+            if backlight:
+                print("Backlight: '{}'{}".format(backlight.path, "" if backlight.writable else " (read-only)"))
+            if backlight or is_command(COMMANDS["get_brightness"]):
+                self.brightness_row = BrightnessRow(backlight)
+                v_box.pack_start(self.brightness_row, True, True, 0)
 
         if preferences["show_volume_slider"]:
             self.volume_row = VolumeRow()
             v_box.pack_start(self.volume_row, True, True, 0)
+            v_box.pack_start(self.volume_row.now_playing, True, True, 0)
 
         if preferences["show_cli_label"] or preferences["show_brightness_slider"] or preferences["show_volume_slider"]:
             sep = Gtk.Separator(orientation=Gtk.Orientation.HORIZONTAL)
@@ -468,20 +840,30 @@ class MyWindow(Gtk.Window):
             self.user_row = UserRow()
             v_box.pack_start(self.user_row, True, True, 0)
 
-        if preferences["show_wifi_line"] and is_command(COMMANDS["get_ssid"]):
-            self.wifi_row = WifiRow()
+        interfaces = wireless_interfaces() if preferences["show_wifi_line"] else []
+        if preferences["show_wifi_line"] and (interfaces or is_command(COMMANDS["get_ssid"])):
+            self.wifi_row = WifiRow(interfaces=interfaces)
             v_box.pack_start(self.wifi_row, True, True, 0)
 
-        shared.bt_on = bt_service_enabled(COMMANDS) and is_command(COMMANDS["get_bt_status"])
+        # don't even connect to the system bus (which may start bluetoothd) if not displayed
+        adapter = get_adapter() if preferences["show_bt_line"] else None
+        shared.bt_on = adapter is not None or (bt_service_enabled(COMMANDS) and is_command(COMMANDS["get_bt_status"]))
 
         if shared.bt_on and preferences["show_bt_line"]:
-            self.bluetooth_row = BluetoothRow()
+            self.bluetooth_row = BluetoothRow(adapter=adapter)
             v_box.pack_start(self.bluetooth_row, True, True, 0)
 
-        if preferences["show_battery_line"] and (is_command(COMMANDS["get_battery"].split()[0])
-                                                 or is_command(COMMANDS["get_battery_alt"])):
-            self.battery_row = BatteryRow()
-            v_box.pack_start(self.battery_row, True, True, 0)
+        if preferences["show_battery_line"]:
+            batteries = get_batteries()
+            command = ""
+            if not batteries:
+                if is_command(COMMANDS["get_battery"]):
+                    command = COMMANDS["get_battery"]
+                elif is_command(COMMANDS["get_battery_alt"]):
+                    command = COMMANDS["get_battery_alt"]
+            if batteries or command:
+                self.battery_row = BatteryRow(command=command)
+                v_box.pack_start(self.battery_row, True, True, 0)
 
         if preferences["show_user_line"] or preferences["show_wifi_line"] \
                 or preferences["show_bt_line"] or preferences["show_battery_line"]:
@@ -513,37 +895,83 @@ class MyWindow(Gtk.Window):
 
     def handle_keyboard(self, item, event):
         if event.type == Gdk.EventType.KEY_RELEASE and event.keyval == Gdk.KEY_Escape:
-            Gtk.main_quit()
+            close_window(self)
         return True
 
+    def on_delete_event(self, window, event):
+        if shared.args.daemon:
+            self.hide()
+            return True
+        return False
 
-def refresh_frequently(window):
-    if window.brightness_row:
-        window.brightness_row.update()
-    if window.volume_row:
-        window.volume_row.update()
-    if window.wifi_row:
-        window.wifi_row.update()
-    if window.bluetooth_row:
-        window.bluetooth_row.update()
+
+def on_daemon_message(message, window):
+    if message == "show" or (message == "toggle" and not window.get_visible()):
+        window.present()
+    elif message in ["hide", "toggle"]:
+        window.hide()
+    elif message == "settings":
+        window.present()
+        window.preferences_btn.launch(window.preferences_btn)
+
+
+def toggle_window(window):
+    on_daemon_message("toggle", window)
     return True
 
 
+def add_fast_rows(scheduler, window):
+    """
+    Rows that need polling get their own timers, w/ intervals from 'refresh_fast_millis' (or the row's "min"
+    in 'row_refresh', if set) up to the row's "max", while nothing changes
+    """
+    if preferences["refresh_fast_millis"] == 0:
+        return
+    for name, row in [("brightness", window.brightness_row), ("volume", window.volume_row),
+                      ("wifi", window.wifi_row), ("bluetooth", window.bluetooth_row)]:
+        # brightness: not every driver sends uevents on changes, always poll
+        if row and not getattr(row, "event_driven", False):
+            limits = preferences["row_refresh"].get(name, {})
+            minimum = limits.get("min", 0) or preferences["refresh_fast_millis"]
+            scheduler.add_row(row, name, minimum, limits.get("max", minimum))
+
+
+def power_profile():
+    """
+    :return: interval multipliers per refresh group (see scheduler.py), 0 to turn the group off
+    """
+    if on_battery():
+        return {"fast": preferences["battery_fast_multiplier"], "slow": preferences["battery_slow_multiplier"],
+                "cli": preferences["battery_cli_multiplier"] if preferences["battery_cli_refresh"] else 0}
+
+    return {"fast": 1, "slow": 1, "cli": 1}
+
+
 def refresh_rarely(window):
+    with trace.span("refresh_rarely", "refresh"):
+        refresh_slow_rows(window)
+    return True
+
+
+def refresh_slow_rows(window):
     if window.battery_row:
         window.battery_row.update()
-    return True
+    # signal level
+    if window.wifi_row and window.wifi_row.event_driven:
+        window.wifi_row.update()
 
 
 def refresh_cli(window):
     if window.cli_label:
-        window.cli_label.update()
+        with trace.span("refresh_cli", "refresh"):
+            window.cli_label.update()
     return True
 
 
 def version():
     try:
-        v = pkg_resources.require("nwgcc")[0].version
+        from importlib.metadata import version as package_version
+        v = package_version("nwgcc")
     except:
         v = 'unknown'
 
@@ -551,6 +979,9 @@ def version():
 
 
 def main():
+    global data_dir, config_dir
+    end_phase("imports")
+
     parser = argparse.ArgumentParser(description="nwg Control Center")
     parser.add_argument("-v", "--version", action="store_true", help="display version information")
     parser.add_argument("-d", "--debug", action="store_true", help="do checks, print results")
@@ -558,15 +989,62 @@ def main():
                         help="place window at the mouse pointer position (Xorg only)")
     parser.add_argument("-s", "--settings", action="store_true", help="open preferences window")
     parser.add_argument("-css", type=str, default="style.css", help="custom css file name")
+    parser.add_argument("-D", "--daemon", action="store_true",
+                        help="stay resident w/ the window hidden; next 'nwgcc' calls (or SIGUSR2) toggle it")
+    parser.add_argument("--show", action="store_true", help="show the resident instance window")
+    parser.add_argument("--hide", action="store_true", help="hide the resident instance window")
+    parser.add_argument("--trace", type=str, metavar="FILE",
+                        help="record start-up, refresh and command timings to FILE (Chrome trace format)")
 
     shared.args = parser.parse_args()
 
+    if shared.args.trace:
+        trace.enable(shared.args.trace)
+        for name, start, end in startup_phases:
+            trace.complete(name, "startup", start, end)
+
     if shared.args.version:
         print("nwgcc version {}".format(version()))
         sys.exit(0)
 
+    # If a resident instance is running, just let it show / hide the window
+    if shared.args.daemon:
+        if send_message("ping"):
+            print("nwgcc daemon already running")
+            sys.exit(1)
+    else:
+        if shared.args.settings:
+            message = "settings"
+        elif shared.args.show:
+            message = "show"
+        elif shared.args.hide:
+            message = "hide"
+        else:
+            message = "toggle"
+        if send_message(message) or shared.args.hide:
+            sys.exit(0)
+
+    data_dir = get_data_dir()
+    config_dir = get_config_dir(data_dir)
+    shared.cache_dir = get_cache_dir()
+    if provision():
+        end_phase("provisioning")
+
+    load_config()
+    shared.icon_theme = Gtk.IconTheme.get_default()
+    # cached pixbufs may come from the previous theme
+    shared.icon_theme.connect("changed", clear_pixbuf_cache)
+    shared.engine = ProbeEngine()
+    if CLI_COMMANDS:
+        shared.cli_engine = ProbeEngine(workers=min(len(CLI_COMMANDS), 4), name="cli")
+    shared.store = Store()
+    stats.register(COMMANDS, [cli_command.command for cli_command in CLI_COMMANDS])
+    runner.default_timeout = preferences["command_timeout_seconds"]
+    end_phase("config")
+
     if shared.args.debug:
         check_all_commands(COMMANDS)
+        end_phase("checks")
 
     if shared.icons_path:
         if "icons_light" in shared.icons_path:
@@ -591,26 +1069,73 @@ def main():
             preferences["custom_styling"] = False
     else:
         print("Style: GTK")
+    end_phase("style")
 
     win = MyWindow()
-    win.show_all()
+    # Refresh rows content in various intervals, while the window is visible
+    # a daemon may show the window hours after its first probes: refresh it then
+    scheduler = RefreshScheduler(win, verbose=shared.args.debug, suspended=shared.args.daemon)
+    add_fast_rows(scheduler, win)
+    scheduler.add("slow", preferences["refresh_slow_seconds"] * 1000, refresh_rarely, win)
+    scheduler.add("cli", preferences["refresh_cli_seconds"] * 1000, refresh_cli, win)
+    if win.cli_label:
+        for interval, i in win.cli_label.intervals():
+            scheduler.add("cli", interval, win.cli_label.run, i)
+    # slower on battery
+    scheduler.set_factors(power_profile())
+    if not uevent.connect("power_supply", lambda event: scheduler.set_factors(power_profile())):
+        # polled only while the window is visible, like everything else
+        scheduler.add("slow", 30000, lambda: scheduler.set_factors(power_profile()) or True)
+
+    server = None
+    if shared.args.daemon:
+        # build and refresh everything, but keep the window hidden until asked to show it
+        win.get_child().show_all()
+        server = DaemonServer(lambda message: on_daemon_message(message, win))
+        GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signal.SIGUSR2, toggle_window, win)
+        for sig in [signal.SIGTERM, signal.SIGINT]:
+            GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, sig, terminate, server)
+    else:
+        win.show_all()
+    GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signal.SIGUSR1, stats.print_report)
 
     if shared.args.settings:
         win.preferences_btn.launch(win.preferences_btn)
+    end_phase("window")
 
-    # Refresh rows content in various intervals
-    if preferences["refresh_fast_millis"] > 0:
-        GLib.timeout_add(preferences["refresh_fast_millis"], refresh_frequently, win)
-    if preferences["refresh_slow_seconds"] > 0:
-        GLib.timeout_add_seconds(preferences["refresh_slow_seconds"], refresh_rarely, win)
-    if preferences["refresh_cli_seconds"] > 0:
-        GLib.timeout_add_seconds(preferences["refresh_cli_seconds"], refresh_cli, win)
+    # rasterize icons not displayed yet, for the next start
+    icons = list(ICONS.values()) + [pos["icon"] for pos in CUSTOM_ROWS] + [pos["icon"] for pos in BUTTONS]
+    prerender_icons(icons + ["emblem-system-symbolic"], [preferences["icon_size_small"], preferences["icon_size_large"]])
 
-    time_current = int(round(time.time() * 1000)) - time_start
-    print("Ready in {} ms".format(time_current))
+    end_phase("timers")
+    phases = ["{} {:.0f}".format(name, (end - start) * 1000) for name, start, end in startup_phases]
+    print("Ready in {:.0f} ms ({})".format((time.perf_counter() - time_start) * 1000, ", ".join(phases)))
+    if shared.args.debug:
+        print_pixbuf_cache_stats()
 
     Gtk.main()
 
+    if shared.args.debug:
+        print_pixbuf_cache_stats()
+        stats.print_report()
+        # idle refresh ticks should only count as 'unchanged'
+        for row in [win.volume_row, win.brightness_row]:
+            if row:
+                print("{}: {}".format(type(row).__name__, row.counters()))
+        print("State store: {}".format(shared.store.counters()))
+
+    # Not terminated, so preferences have been applied: restart to load them
+    if server and not server.closed:
+        server.close()
+        trace.save()
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+
+
+def terminate(server):
+    server.close()
+    Gtk.main_quit()
+    return False
+
 
 if __name__ == "__main__":
     sys.exit(main())
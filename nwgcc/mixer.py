@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import subprocess
+import threading
+import time
+
+py_alsa = False
+try:
+    from pyalsa import alsamixer
+    py_alsa = True
+except:
+    pass
+
+from gi.repository import GLib
+
+from nwgcc.tools import get_volume, set_volume, is_command
+from nwgcc.runner import run
+
+
+class PollCollector(object):
+    """
+    Stands for a select.poll object in Mixer.register_poll, just collects the descriptors
+    """
+    def __init__(self):
+        self.fds = []
+
+    def register(self, fd, events):
+        self.fds.append((fd, events))
+
+
+class AlsaMixer(object):
+    """
+    Long-lived pyalsa mixer session, whose poll descriptors are watched in the GLib main loop
+    """
+    def __init__(self, control="Master"):
+        # probes call get() from worker threads
+        self.lock = threading.Lock()
+        self.mixer = alsamixer.Mixer()
+        self.mixer.attach()
+        self.mixer.load()
+        self.element = alsamixer.Element(self.mixer, control)
+        self.max_vol = self.element.get_volume_range()[1]
+        self.callback = None
+
+    def get(self):
+        """
+        :return: volume percentage, switch (False if muted)
+        """
+        with self.lock:
+            vol = int(round(self.element.get_volume() * 100 / self.max_vol, 0))
+            switch = self.element.get_switch()
+        return vol, switch
+
+    def set(self, percent):
+        with self.lock:
+            self.element.set_volume_all(int(percent * self.max_vol / 100))
+
+    def watch(self, callback):
+        """
+        Call `callback` in the main loop whenever ALSA reports a mixer change
+        :return: True if change events are available
+        """
+        collector = PollCollector()
+        try:
+            self.mixer.register_poll(collector)
+        except Exception as e:
+            print("ERROR: couldn't get ALSA poll descriptors: {}".format(e))
+            return False
+
+        for fd, events in collector.fds:
+            GLib.io_add_watch(fd, GLib.PRIORITY_DEFAULT, GLib.IO_IN | GLib.IO_PRI, self.on_event)
+        self.callback = callback
+
+        return bool(collector.fds)
+
+    def on_event(self, source, condition):
+        with self.lock:
+            # reads pending events, clears the descriptor state
+            self.mixer.handle_events()
+        self.callback()
+
+        return True
+
+
+class PulseMixer(object):
+    """
+    PulseAudio / PipeWire (pipewire-pulse) backend. One long-lived `pactl subscribe` stream is watched in the main
+    loop; the default sink volume and mute state are only queried after a sink or server change event.
+    Sink events that follow our own set() are not re-queried one by one: the volume is known already. The state is
+    queried once, after the writes settle, in case something else (e.g. the mute key) changed it meanwhile.
+    """
+    # seconds after set(), in which sink change events are considered our own
+    own_event_seconds = 0.5
+
+    def __init__(self, pactl="pactl"):
+        self.pactl = pactl
+        self.lock = threading.Lock()
+        self.volume = None, False
+        self.dirty = True
+        # time.monotonic() of the last set()
+        self.written_at = 0
+        # GLib source id of the re-query after our own writes
+        self.settle_timer = None
+        self.callback = None
+        self.process = None
+        self.buffer = b""
+
+    def get(self):
+        """
+        :return: volume percentage, switch (False if muted); cached until the next change event
+        """
+        with self.lock:
+            if self.dirty:
+                self.dirty = False
+                self.volume = self.query()
+            return self.volume
+
+    def query(self):
+        vol = None
+        result = run([self.pactl, "get-sink-volume", "@DEFAULT_SINK@"], shell=False)
+        if result.returncode != 0:
+            print("ERROR: '{} get-sink-volume' failed, exit status {}".format(self.pactl, result.returncode))
+            return None, False
+        # 'Volume: front-left: 32768 /  50% / -18.06 dB,   front-right: ...'
+        match = re.search(r"(\d+)%", result.output)
+        if match:
+            vol = int(match.group(1))
+        result = run([self.pactl, "get-sink-mute", "@DEFAULT_SINK@"], shell=False)
+        switch = result.output.split(":")[-1].strip() != "yes"
+
+        return vol, switch
+
+    def set(self, percent):
+        result = run([self.pactl, "set-sink-volume", "@DEFAULT_SINK@", "{}%".format(int(percent))], shell=False)
+        if result.returncode == 0:
+            with self.lock:
+                self.volume = int(percent), self.volume[1]
+                self.written_at = time.monotonic()
+
+    def watch(self, callback):
+        self.callback = callback
+        return self.subscribe()
+
+    def subscribe(self):
+        try:
+            self.process = subprocess.Popen([self.pactl, "subscribe"], stdout=subprocess.PIPE,
+                                            stderr=subprocess.DEVNULL)
+        except OSError as e:
+            print("ERROR: couldn't subscribe to sink events: {}".format(e))
+            return False
+        GLib.io_add_watch(self.process.stdout.fileno(), GLib.PRIORITY_DEFAULT, GLib.IO_IN | GLib.IO_HUP,
+                          self.on_readable)
+
+        return True
+
+    def on_readable(self, source, condition):
+        data = os.read(source, 4096)
+        if not data:
+            # sound server restarted? the state may have changed meanwhile
+            self.process.wait()
+            print("'{} subscribe' exited, resubscribing".format(self.pactl))
+            GLib.timeout_add_seconds(1, self.resubscribe)
+            return False
+
+        lines = (self.buffer + data).split(b"\n")
+        self.buffer = lines.pop()
+        # "Event 'change' on sink #56", "Event 'change' on server #-1" (e.g. default sink changed)
+        server = any(b" on server " in line for line in lines)
+        sink = any(b" on sink " in line for line in lines)
+        if sink and not server and self.settle_time() > 0:
+            if self.settle_timer is None:
+                self.settle_timer = GLib.timeout_add(int(self.settle_time() * 1000) + 1, self.on_settled)
+        elif sink or server:
+            self.changed()
+
+        return True
+
+    def settle_time(self):
+        """
+        :return: seconds left until events stop being considered our own, <= 0 if they're not
+        """
+        return self.written_at + self.own_event_seconds - time.monotonic()
+
+    def on_settled(self):
+        remaining = self.settle_time()
+        if remaining > 0:
+            # still being written to (slider dragged)
+            self.settle_timer = GLib.timeout_add(int(remaining * 1000) + 1, self.on_settled)
+        else:
+            self.settle_timer = None
+            self.changed()
+        # remove this timeout source
+        return False
+
+    def changed(self):
+        with self.lock:
+            self.dirty = True
+        if self.callback:
+            self.callback()
+
+    def resubscribe(self):
+        self.buffer = b""
+        if self.subscribe():
+            self.changed()
+        # remove the timeout source
+        return False
+
+
+def pulse_available(pactl="pactl"):
+    """
+    :return: True if a PulseAudio compatible server (PulseAudio, pipewire-pulse) is running, and `pactl` knows
+    the 'get-sink-volume' command (PulseAudio >= 15), that PulseMixer relies on
+    """
+    if not is_command(pactl):
+        return False
+    return run([pactl, "get-sink-volume", "@DEFAULT_SINK@"], shell=False,
+               stderr=subprocess.DEVNULL).returncode == 0
+
+
+class AmixerMixer(object):
+    """
+    Fallback if pyalsa not found: parses the `amixer` output
+    """
+    def __init__(self, get_cmd, set_cmd):
+        self.get_cmd = get_cmd
+        self.set_cmd = set_cmd
+
+    def get(self):
+        return get_volume(self.get_cmd)
+
+    def set(self, percent):
+        set_volume(percent, self.set_cmd)
+
+    def watch(self, callback):
+        return False
+
+
+def get_mixer(commands_dict):
+    if pulse_available():
+        return PulseMixer()
+
+    if py_alsa:
+        try:
+            return AlsaMixer()
+        except Exception as e:
+            print("ERROR: couldn't open ALSA mixer: {}, trying 'amixer'".format(e))
+
+    return AmixerMixer(commands_dict["get_volume_alt"], commands_dict["set_volume_alt"])
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+from gi.repository import Gio, GLib
+
+MPRIS_PREFIX = "org.mpris.MediaPlayer2"
+MPRIS_PATH = "/org/mpris/MediaPlayer2"
+PLAYER_INTERFACE = "org.mpris.MediaPlayer2.Player"
+
+DBUS_NAME = "org.freedesktop.DBus"
+DBUS_PATH = "/org/freedesktop/DBus"
+
+
+class MprisWatcher(object):
+    """
+    Follows MPRIS media players on the session bus. Player state comes with the PropertiesChanged signals,
+    `callback(status, title, artist)` is called in the main loop whenever the active player state changes.
+    """
+    def __init__(self, callback):
+        self.callback = callback
+        self.players = {}  # bus name: Gio.DBusProxy
+        self.active = None  # bus name of the player most recently changed
+
+        self.bus = Gio.bus_get_sync(Gio.BusType.SESSION, None)
+        self.bus.signal_subscribe(DBUS_NAME, DBUS_NAME, "NameOwnerChanged", DBUS_PATH, MPRIS_PREFIX,
+                                  Gio.DBusSignalFlags.MATCH_ARG0_NAMESPACE, self.on_name_owner_changed)
+
+        names = self.bus.call_sync(DBUS_NAME, DBUS_PATH, DBUS_NAME, "ListNames", None, None,
+                                   Gio.DBusCallFlags.NONE, -1, None).unpack()[0]
+        for name in names:
+            if name.startswith(MPRIS_PREFIX + "."):
+                self.add_player(name)
+
+    def add_player(self, name):
+        try:
+            proxy = Gio.DBusProxy.new_sync(self.bus, Gio.DBusProxyFlags.GET_INVALIDATED_PROPERTIES, None, name,
+                                           MPRIS_PATH, PLAYER_INTERFACE, None)
+        except GLib.Error as e:
+            print("ERROR: couldn't connect to '{}': {}".format(name, e))
+            return
+        proxy.connect("g-properties-changed", self.on_properties_changed, name)
+        self.players[name] = proxy
+        if self.status(name) == "Playing" or not self.active:
+            self.active = name
+
+    def on_name_owner_changed(self, connection, sender, path, interface, signal, parameters):
+        name, old_owner, new_owner = parameters.unpack()
+        if old_owner and name in self.players:
+            del self.players[name]
+            if self.active == name:
+                self.active = self.find_playing()
+        if new_owner:
+            self.add_player(name)
+        self.callback(*self.state())
+
+    def on_properties_changed(self, proxy, changed, invalidated, name):
+        if self.status(name) == "Playing" or not self.active:
+            self.active = name
+        elif self.active == name and self.status(name) != "Playing":
+            # this one paused or stopped, something else may still be playing
+            self.active = self.find_playing() or name
+        self.callback(*self.state())
+
+    def find_playing(self):
+        for name in self.players:
+            if self.status(name) == "Playing":
+                return name
+        return next(iter(self.players), None)
+
+    def status(self, name):
+        value = self.players[name].get_cached_property("PlaybackStatus")
+        return value.unpack() if value else ""
+
+    def state(self):
+        """
+        :return: playback status ('Playing', 'Paused', 'Stopped' or '' if no player), title, artist
+        """
+        if not self.active:
+            return "", "", ""
+        metadata = self.players[self.active].get_cached_property("Metadata")
+        metadata = metadata.unpack() if metadata else {}
+        title = metadata.get("xesam:title", "")
+        artist = ", ".join(metadata.get("xesam:artist", []))
+
+        return self.status(self.active), title, artist
+
+    def command(self, method):
+        """
+        :param method: 'PlayPause', 'Next', 'Previous'...
+        """
+        if self.active:
+            self.players[self.active].call(method, None, Gio.DBusCallFlags.NONE, -1, None, None)
+
+
+def get_watcher(callback):
+    try:
+        return MprisWatcher(callback)
+    except GLib.Error as e:
+        print("ERROR: couldn't watch media players: {}".format(e))
+        return None
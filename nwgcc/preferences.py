@@ -7,7 +7,7 @@ gi.require_version('Gtk', '3.0')
 from gi.repository import Gtk, Gdk, GLib
 
 from nwgcc import shared
-from nwgcc.tools import save_json, load_json, load_cli_commands, save_string, create_pixbuf, is_command
+from nwgcc.tools import save_json, load_json, load_cli_commands, save_string, create_pixbuf
 
 
 class PreferencesWindow(Gtk.Window):
@@ -82,12 +82,10 @@ class PreferencesWindow(Gtk.Window):
         checkbutton.connect("toggled", self.on_checkbutton_toggled, "show_volume_slider")
         hbox.pack_start(checkbutton, False, False, 0)
 
-        checkbutton = Gtk.CheckButton.new_with_label("PlayerCtl")
+        checkbutton = Gtk.CheckButton.new_with_label("Media player")
+        checkbutton.set_tooltip_text("MPRIS player controls")
         checkbutton.set_active(self.preferences["show_playerctl"])
-        if is_command("playerctl"):
-            checkbutton.connect("toggled", self.on_checkbutton_toggled, "show_playerctl")
-        else:
-            checkbutton.set_sensitive(False)
+        checkbutton.connect("toggled", self.on_checkbutton_toggled, "show_playerctl")
         hbox.pack_start(checkbutton, False, False, 0)
         grid.attach(hbox, 2, 3, 1, 1)
 
@@ -238,6 +236,54 @@ class PreferencesWindow(Gtk.Window):
         spin_button.connect("value-changed", self.on_spin_value_changed, "refresh_slow_seconds")
         grid.attach(spin_button, 2, 11, 1, 1)
 
+        label = Gtk.Label()
+        label.set_halign(Gtk.Align.START)
+        label.set_text("Command timeout [s]")
+        label.set_tooltip_text("Commands running longer get killed; 0 for no limit")
+        grid.attach(label, 0, 12, 1, 1)
+
+        spin_button = Gtk.SpinButton.new_with_range(0, 300, 1)
+        spin_button.set_value(self.preferences["command_timeout_seconds"])
+        spin_button.connect("value-changed", self.on_spin_value_changed, "command_timeout_seconds")
+        grid.attach(spin_button, 0, 13, 1, 1)
+
+        label = Gtk.Label()
+        label.set_halign(Gtk.Align.START)
+        label.set_text("Slider writes every [ms]")
+        label.set_tooltip_text("Volume and brightness are set not more often while dragging a slider")
+        grid.attach(label, 1, 12, 1, 1)
+
+        spin_button = Gtk.SpinButton.new_with_range(0, 1000, 10)
+        spin_button.set_value(self.preferences["slider_write_millis"])
+        spin_button.connect("value-changed", self.on_spin_value_changed, "slider_write_millis")
+        grid.attach(spin_button, 1, 13, 1, 1)
+
+        # battery refresh profile: the 3 refresh rates above multiplied by
+        label = Gtk.Label()
+        label.set_halign(Gtk.Align.START)
+        label.set_text("On battery, refresh rates above x")
+        grid.attach(label, 0, 14, 3, 1)
+
+        spin_button = Gtk.SpinButton.new_with_range(1, 10, 1)
+        spin_button.set_value(self.preferences["battery_cli_multiplier"])
+        spin_button.connect("value-changed", self.on_spin_value_changed, "battery_cli_multiplier")
+        grid.attach(spin_button, 0, 15, 1, 1)
+
+        spin_button = Gtk.SpinButton.new_with_range(1, 10, 1)
+        spin_button.set_value(self.preferences["battery_fast_multiplier"])
+        spin_button.connect("value-changed", self.on_spin_value_changed, "battery_fast_multiplier")
+        grid.attach(spin_button, 1, 15, 1, 1)
+
+        spin_button = Gtk.SpinButton.new_with_range(1, 10, 1)
+        spin_button.set_value(self.preferences["battery_slow_multiplier"])
+        spin_button.connect("value-changed", self.on_spin_value_changed, "battery_slow_multiplier")
+        grid.attach(spin_button, 2, 15, 1, 1)
+
+        checkbutton = Gtk.CheckButton.new_with_label("Refresh CLI label on battery")
+        checkbutton.set_active(self.preferences["battery_cli_refresh"])
+        checkbutton.connect("toggled", self.on_checkbutton_toggled, "battery_cli_refresh")
+        grid.attach(checkbutton, 0, 16, 2, 1)
+
         button_box = Gtk.HBox(True, False)
 
         button = Gtk.Button.new_with_label("User rows")
@@ -260,7 +306,7 @@ class PreferencesWindow(Gtk.Window):
         button.connect("clicked", self.on_apply_button)
         button_box.pack_start(button, True, True, 0)
 
-        grid.attach(button_box, 0, 12, 3, 1)
+        grid.attach(button_box, 0, 17, 3, 1)
 
         box_outer_h.pack_start(grid, True, True, 20)
 
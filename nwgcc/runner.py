@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+
+"""
+Every command nwgcc runs goes through here: it's given a time limit, timed (see stats.py) and traced (trace.py)
+"""
+
+import os
+import re
+import shlex
+import signal
+import subprocess
+import threading
+import time
+from collections import namedtuple
+
+from gi.repository import GLib
+
+from nwgcc import trace, stats
+from nwgcc.coprocess import ShellWorker
+
+# `output`: stdout decoded and stripped; `returncode`: 127 if the executable not found
+Result = namedtuple("Result", ["output", "returncode", "timed_out"])
+
+# seconds, 0 for no limit; set from the 'command_timeout_seconds' preference
+default_timeout = 10
+
+# a command containing any of these needs the shell: pipes, redirections, expansions, globs, lists, comments,
+# negation ('! pgrep foo')
+shell_syntax = re.compile(r"[|&;<>()$`\\*?\[\]{}~#!\n]")
+# builtins w/o an executable of the same name
+shell_only = {".", ":", "alias", "cd", "eval", "exec", "exit", "export", "read", "return", "set", "shift", "source",
+              "trap", "ulimit", "umask", "unset", "wait"}
+
+# commands that need the shell are run by a persistent shell coprocess, one per thread
+use_coprocess = True
+workers = threading.local()
+
+
+def command_name(cmd):
+    """
+    :param cmd: command line, or argv list
+    :return: executable name, to label trace spans
+    """
+    argv = cmd.split() if isinstance(cmd, str) else cmd
+    return os.path.basename(argv[0]) if argv else ""
+
+
+def split_command(cmd):
+    """
+    :return: argv list if `cmd` is a simple command, that may be executed w/o the shell, or None
+    """
+    if shell_syntax.search(cmd):
+        return None
+    try:
+        argv = shlex.split(cmd)
+    except ValueError:
+        # e.g. unbalanced quotes: let the shell report the error
+        return None
+    # variable assignments, e.g. 'LANG=C date'
+    if not argv or "=" in argv[0] or argv[0] in shell_only:
+        return None
+
+    return argv
+
+
+def run(cmd, shell=True, timeout=None, **kwargs):
+    """
+    Run `cmd` in a new process group, which is killed as a whole if the time limit is exceeded, so that
+    no grandchild (e.g. `curl` started by the shell) keeps running, or keeps the output pipe open.
+    Simple commands (see split_command) are executed directly, to save the /bin/sh fork and exec.
+    :param cmd: command line, or argv list if not `shell`
+    :param timeout: seconds, `default_timeout` if None
+    :return: Result
+    """
+    if timeout is None:
+        timeout = default_timeout
+    argv = split_command(cmd) if shell else cmd
+    if argv is None and use_coprocess and not kwargs:
+        return run_batch([cmd], timeout)[0]
+    start = time.perf_counter()
+    with trace.span(command_name(cmd), "command", argv=cmd, shell=argv is None) as info:
+        try:
+            result = communicate(argv if argv else cmd, argv is None, timeout if timeout else None, kwargs)
+        finally:
+            stats.record(cmd, time.perf_counter() - start)
+        info["exit_code"] = result.returncode
+        info["timed_out"] = result.timed_out
+
+    return result
+
+
+def run_batch(commands, timeout=None):
+    """
+    Run shell commands one after another, in a single round trip to this thread's shell coprocess
+    :param timeout: per command, seconds; `default_timeout` if None
+    :return: list of Result
+    """
+    if timeout is None:
+        timeout = default_timeout
+    worker = getattr(workers, "shell", None)
+    if worker is None:
+        worker = workers.shell = ShellWorker()
+
+    start = time.perf_counter()
+    try:
+        batch = worker.run_batch(commands, timeout if timeout else None)
+    except OSError as e:
+        print("ERROR: shell coprocess failed: {}, running commands separately".format(e))
+        return [communicate(cmd, True, timeout if timeout else None, {}) for cmd in commands]
+
+    results = []
+    for cmd, (output, returncode, timed_out, seconds) in zip(commands, batch):
+        stats.record(cmd, seconds)
+        trace.complete(command_name(cmd), "command", start, start + seconds,
+                       args={"argv": cmd, "shell": "coprocess", "exit_code": returncode, "timed_out": timed_out})
+        start += seconds
+        results.append(Result(output, returncode, timed_out))
+
+    return results
+
+
+def communicate(cmd, shell, timeout, kwargs):
+    try:
+        process = subprocess.Popen(cmd, shell=shell, stdout=subprocess.PIPE, start_new_session=True, **kwargs)
+    except OSError as e:
+        print("ERROR: couldn't run '{}': {}".format(cmd, e))
+        return Result("", 127, False)
+
+    timed_out = False
+    try:
+        output, errors = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        print("ERROR: '{}' timed out after {} s".format(cmd, timeout))
+        kill_group(process)
+        output, errors = process.communicate()
+
+    return Result(output.decode("utf-8", errors="replace").strip(), process.returncode, timed_out)
+
+
+def kill_group(process):
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def launch_command(cmd):
+    """
+    Start a program in a new session w/o waiting for it to finish; simple commands w/o the shell.
+    posix_spawn is cheaper than subprocess.Popen's fork & exec, and we don't need any of its features here.
+    The child is reaped in the GLib main loop.
+    """
+    print("Executing '{}'".format(cmd))
+    argv = split_command(cmd)
+    if argv is None:
+        argv = ["/bin/sh", "-c", "exec {}".format(cmd)]
+    start = time.perf_counter()
+    # Python < 3.8
+    if not hasattr(os, "posix_spawnp"):
+        subprocess.Popen(argv, start_new_session=True)
+        return
+    try:
+        pid = os.posix_spawnp(argv[0], argv, os.environ, setsid=True,
+                              setsigdef=(signal.SIGPIPE, signal.SIGXFSZ))
+    except OSError as e:
+        print("ERROR: couldn't run '{}': {}".format(cmd, e))
+        return
+
+    GLib.child_watch_add(GLib.PRIORITY_DEFAULT, pid, on_child_exit, (cmd, argv, start))
+
+
+def on_child_exit(pid, status, data):
+    cmd, argv, start = data
+    # wait status: exit code in the high byte, or the signal number
+    exit_code = status >> 8 if status & 0x7f == 0 else -(status & 0x7f)
+    trace.complete(command_name(cmd), "launch", start, args={"argv": argv, "pid": pid, "exit_code": exit_code})
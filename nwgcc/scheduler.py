@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+import time
+
+from gi.repository import Gdk, GLib
+
+from nwgcc import trace
+
+# groups of tasks, that a refresh profile may slow down or turn off
+GROUPS = ["fast", "slow", "cli"]
+
+
+def add_timer(interval, callback, args):
+    # whole seconds: let GLib group wakeups w/ other timers
+    if interval % 1000 == 0:
+        return GLib.timeout_add_seconds(interval // 1000, callback, *args)
+    return GLib.timeout_add(interval, callback, *args)
+
+
+class RefreshScheduler(object):
+    """
+    Runs the periodic refresh callbacks only while the window is visible. Timers are removed when the window gets
+    unmapped (hidden, moved to another workspace) or minimized, and added back when it shows up again, w/ the
+    callbacks whose interval ran out meanwhile run once to catch up.
+    Pass `suspended=True` if the window is built long before it's first shown (daemon mode), so that it catches up
+    on the first map, too.
+    Intervals of each group are multiplied by the current profile factors (see set_factors).
+    """
+    def __init__(self, window, verbose=False, suspended=False):
+        self.window = window
+        self.verbose = verbose
+        # (group, interval in milliseconds, callback, args)
+        self.tasks = []
+        # time.monotonic() each task last ran, by index
+        self.last_run = []
+        self.row_timers = []
+        # group: interval multiplier, 0 to turn the group off
+        self.factors = {group: 1 for group in GROUPS}
+        # GLib source ids, while running
+        self.timers = []
+        self.running = False
+        self.mapped = False
+        self.iconified = False
+        self.suspended = suspended
+
+        window.connect("map-event", self.on_map)
+        window.connect("unmap-event", self.on_unmap)
+        window.connect("window-state-event", self.on_window_state)
+        window.connect("focus-in-event", self.on_focus_in)
+
+    def add(self, group, interval, callback, *args):
+        """
+        :param group: one of GROUPS
+        :param interval: milliseconds; 0 to never call `callback`
+        :param callback: its return value is ignored, the timer is removed by the scheduler
+        """
+        if interval > 0:
+            self.tasks.append((group, interval, callback, args))
+            # just set up, so up to date
+            self.last_run.append(time.monotonic())
+            if self.running and self.factors[group]:
+                self.timers.append(add_timer(interval * self.factors[group], self.run_task, (len(self.tasks) - 1,)))
+
+    def run_task(self, i):
+        group, interval, callback, args = self.tasks[i]
+        self.last_run[i] = time.monotonic()
+        callback(*args)
+        # keep the timer
+        return True
+
+    def overdue(self, i):
+        group, interval, callback, args = self.tasks[i]
+        return time.monotonic() - self.last_run[i] >= interval * self.factors[group] / 1000
+
+    def add_row(self, row, name, minimum, maximum):
+        """
+        Poll `row` w/ its own, adaptive interval (see RowTimer); in the 'fast' group
+        """
+        if minimum > 0:
+            row_timer = RowTimer(row, name, minimum, maximum)
+            row_timer.factor = self.factors["fast"]
+            self.row_timers.append(row_timer)
+            if self.running and row_timer.factor:
+                row_timer.start()
+
+    def set_factors(self, factors):
+        """
+        :param factors: {group: multiplier}
+        """
+        if factors == self.factors:
+            return
+        self.factors = factors
+        if self.verbose:
+            print("Refresh factors: {}".format(factors))
+        for row_timer in self.row_timers:
+            row_timer.factor = factors["fast"]
+        if self.running:
+            self.remove_timers()
+            self.add_timers()
+
+    def on_map(self, window, event):
+        self.mapped = True
+        self.check()
+        return False
+
+    def on_unmap(self, window, event):
+        self.mapped = False
+        self.check()
+        return False
+
+    def on_window_state(self, window, event):
+        self.iconified = bool(event.new_window_state & (Gdk.WindowState.ICONIFIED | Gdk.WindowState.WITHDRAWN))
+        self.check()
+        return False
+
+    def on_focus_in(self, window, event):
+        # focused, so it must be visible, whatever we've been told before
+        self.mapped = True
+        self.iconified = False
+        self.check()
+        return False
+
+    def check(self):
+        visible = self.mapped and not self.iconified
+        if visible and not self.running:
+            self.start()
+        elif not visible and self.running:
+            self.stop()
+
+    def add_timers(self):
+        for i, (group, interval, callback, args) in enumerate(self.tasks):
+            if self.factors[group]:
+                self.timers.append(add_timer(interval * self.factors[group], self.run_task, (i,)))
+        for row_timer in self.row_timers:
+            if row_timer.factor:
+                row_timer.start()
+
+    def remove_timers(self):
+        for timer in self.timers:
+            GLib.source_remove(timer)
+        self.timers = []
+        for row_timer in self.row_timers:
+            row_timer.stop()
+
+    def start(self):
+        self.running = True
+        self.add_timers()
+        # missed some ticks; e.g. network commands run '@every 30m' are not rerun each time the window pops up
+        if self.suspended:
+            self.suspended = False
+            if self.verbose:
+                print("Refresh resumed")
+            for i, (group, interval, callback, args) in enumerate(self.tasks):
+                if self.factors[group] and self.overdue(i):
+                    self.run_task(i)
+            for row_timer in self.row_timers:
+                if row_timer.factor and row_timer.overdue():
+                    row_timer.reset()
+                    row_timer.last_run = time.monotonic()
+                    row_timer.row.update()
+
+    def stop(self):
+        self.remove_timers()
+        self.running = False
+        self.suspended = True
+        if self.verbose:
+            print("Refresh suspended")
+
+
+class RowTimer(object):
+    """
+    Calls `row.update()` every `interval` milliseconds. The row reports its probe results w/ `result()`: each time
+    they're the same as before the interval doubles, up to `maximum`; it's back to `minimum` after a change,
+    or after `reset()` (e.g. on user interaction).
+    """
+    def __init__(self, row, name, minimum, maximum):
+        self.row = row
+        self.name = name
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.interval = minimum
+        # set by the scheduler's refresh profile
+        self.factor = 1
+        self.values = None
+        self.source = None
+        # time.monotonic()
+        self.last_run = time.monotonic()
+        row.timer = self
+
+    def start(self):
+        self.stop()
+        self.source = GLib.timeout_add(self.interval * self.factor, self.on_timeout)
+
+    def stop(self):
+        if self.source is not None:
+            GLib.source_remove(self.source)
+            self.source = None
+
+    def overdue(self):
+        return time.monotonic() - self.last_run >= self.interval * self.factor / 1000
+
+    def on_timeout(self):
+        self.last_run = time.monotonic()
+        with trace.span(self.name, "refresh", interval=self.interval * self.factor):
+            self.row.update()
+        self.source = GLib.timeout_add(self.interval * self.factor, self.on_timeout)
+        # this one-shot source is done, the next one has its own interval
+        return False
+
+    def result(self, values):
+        if values == self.values:
+            self.interval = min(self.interval * 2, self.maximum)
+        else:
+            self.values = values
+            self.reset()
+
+    def reset(self):
+        if self.interval != self.minimum:
+            self.interval = self.minimum
+            # if running, don't wait for the backed off timeout
+            if self.source is not None:
+                self.start()
@@ -2,7 +2,12 @@
 
 icon_theme = None
 icons_path = ""
+cache_dir = None
 dirname = None
 initial_path = "/usr/share/icons"
 args = None
 bt_on = False
+engine = None
+# CLI label lines, that may run for long, w/o delaying row probes and slider writes
+cli_engine = None
+store = None
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+"""
+Latency of the commands nwgcc runs, per `commands` key of preferences.json, and per CLI label line
+"""
+
+import threading
+from collections import deque
+
+# flag commands whose 95th percentile latency exceeds this
+SLOW_MS = 100
+# latest samples kept per command
+SAMPLES = 512
+
+# command line: label to group its samples under
+labels = {}
+# label: {"count": int, "max": float, "samples": deque of milliseconds}
+records = {}
+lock = threading.Lock()
+
+
+def register(commands_dict, cli_commands):
+    """
+    Name commands after their keys in the `commands` dictionary, and CLI label lines after their line number
+    """
+    labels.clear()
+    for key, command in commands_dict.items():
+        labels[command] = key
+    for i, command in enumerate(cli_commands):
+        labels[command] = "cli {}".format(i + 1)
+
+
+def get_label(cmd):
+    """
+    :param cmd: command line or argv list
+    """
+    if not isinstance(cmd, str):
+        return " ".join(cmd[:2])
+    if cmd in labels:
+        return labels[cmd]
+    # setters are given arguments, e.g. 'light -S 50'
+    for command, label in labels.items():
+        if command and cmd.startswith(command + " "):
+            return label
+
+    return cmd.split()[0] if cmd.split() else cmd
+
+
+def record(cmd, seconds):
+    label = get_label(cmd)
+    ms = seconds * 1000
+    with lock:
+        if label not in records:
+            records[label] = {"count": 0, "max": 0.0, "samples": deque(maxlen=SAMPLES)}
+        entry = records[label]
+        entry["count"] += 1
+        entry["max"] = max(entry["max"], ms)
+        entry["samples"].append(ms)
+
+
+def percentile(values, fraction):
+    """
+    :param values: sorted list
+    """
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def report():
+    """
+    :return: lines of text, slowest commands first
+    """
+    with lock:
+        rows = []
+        for label, entry in records.items():
+            values = sorted(entry["samples"])
+            rows.append((label, entry["count"], percentile(values, 0.5), percentile(values, 0.95), entry["max"]))
+
+    rows.sort(key=lambda row: row[3], reverse=True)
+    lines = ["{:<20} {:>6} {:>9} {:>9} {:>9}".format("command", "count", "p50 ms", "p95 ms", "max ms")]
+    for label, count, p50, p95, maximum in rows:
+        line = "{:<20} {:>6} {:>9.1f} {:>9.1f} {:>9.1f}".format(label, count, p50, p95, maximum)
+        if p95 > SLOW_MS:
+            line += "  SLOW"
+        lines.append(line)
+
+    return lines
+
+
+def print_report(*args):
+    """
+    Also the SIGUSR1 handler
+    """
+    print("\n".join(report()))
+    # keep the signal source
+    return True
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+"""
+State shared by probes and widgets. Probe results are written in, widgets subscribe to the keys they display,
+and only get called when a value actually changes, so that unchanged results cost no GTK redraw / relayout.
+"""
+
+# key: type of its value; None is always allowed (unknown / not available)
+TYPES = {
+    "user": str,
+    "volume": int,
+    "muted": bool,
+    "brightness": int,
+    "ssid": str,
+    "wifi_signal": int,
+    "bt_powered": bool,
+    "bt_name": str,
+    "battery": str,
+    "battery_level": int,
+    "battery_details": str,
+    "player_status": str,
+    "now_playing": str,
+}
+# CLI label lines: 'cli:0', 'cli:1'...
+CLI_PREFIX = "cli:"
+
+
+def check_type(key, value):
+    expected = str if key.startswith(CLI_PREFIX) else TYPES.get(key)
+    if expected is None:
+        raise KeyError("unknown state key '{}'".format(key))
+    if value is not None and not isinstance(value, expected):
+        raise TypeError("state '{}' should be {}, got {!r}".format(key, expected.__name__, value))
+
+
+class Store(object):
+    """
+    Only use from the main loop
+    """
+    def __init__(self):
+        self.values = {}
+        # key: callbacks
+        self.subscribers = {}
+        # values written, and the ones that changed
+        self.writes = 0
+        self.changes = 0
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    def subscribe(self, keys, callback):
+        """
+        Call `callback()` once per update() that changed any of `keys`
+        """
+        for key in keys:
+            check_type(key, None)
+            self.subscribers.setdefault(key, []).append(callback)
+
+    def update(self, values):
+        """
+        :param values: {key: value}
+        :return: True if any value changed
+        """
+        changed = False
+        callbacks = []
+        for key, value in values.items():
+            check_type(key, value)
+            self.writes += 1
+            if key in self.values and self.values[key] == value:
+                continue
+            self.values[key] = value
+            self.changes += 1
+            changed = True
+            for callback in self.subscribers.get(key, []):
+                if callback not in callbacks:
+                    callbacks.append(callback)
+
+        for callback in callbacks:
+            callback()
+
+        return changed
+
+    def counters(self):
+        return "{} values written, {} changed".format(self.writes, self.changes)
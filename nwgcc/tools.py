@@ -1,23 +1,20 @@
 #!/usr/bin/env python3
 
 import os
-import subprocess
 import json
-import pkg_resources
+import re
+import threading
+import hashlib
+import struct
 from shutil import copyfile
+from collections import OrderedDict, namedtuple
 
-from nwgcc import shared
-
-py_alsa = False
-try:
-    from pyalsa import alsamixer
-    py_alsa = True
-except:
-    pass
+from nwgcc import shared, trace
+from nwgcc.runner import run, run_batch, launch_command
 
 import gi
 gi.require_version('Gtk', '3.0')
-from gi.repository import Gtk, GdkPixbuf
+from gi.repository import Gtk, GdkPixbuf, GLib
 
 
 def rgba_to_hex(color):
@@ -30,41 +27,181 @@ def rgba_to_hex(color):
                                            int(color.blue * 255))
 
 
+# (icon, size, icons path): (pixbuf, source file or None, source mtime), least recently used first
+pixbuf_cache = OrderedDict()
+pixbuf_cache_size = 128
+pixbuf_cache_stats = {"hits": 0, "misses": 0}
+
+
 def create_pixbuf(icon, size):
+    key = (icon, size, shared.icons_path)
+    if key in pixbuf_cache:
+        pixbuf, source, mtime = pixbuf_cache[key]
+        if source is None or file_mtime(source) == mtime:
+            pixbuf_cache.move_to_end(key)
+            pixbuf_cache_stats["hits"] += 1
+            return pixbuf
+
+    pixbuf_cache_stats["misses"] += 1
+    with trace.span(os.path.basename(icon), "pixbuf", icon=icon, size=size) as info:
+        pixbuf, source = load_pixbuf(icon, size)
+        info["source"] = source
+    pixbuf_cache[key] = (pixbuf, source, file_mtime(source) if source else None)
+    pixbuf_cache.move_to_end(key)
+    if len(pixbuf_cache) > pixbuf_cache_size:
+        pixbuf_cache.popitem(last=False)
+
+    return pixbuf
+
+
+def clear_pixbuf_cache(*args):
+    """
+    Connected to the icon theme 'changed' signal
+    """
+    pixbuf_cache.clear()
+
+
+def file_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def load_pixbuf(icon, size):
+    """
+    :return: pixbuf, file it's been loaded from (None if from the GTK icon theme)
+    """
+    icon_missing = os.path.join(shared.dirname, 'icons_light/icon-missing.svg')
+    resolved = resolve_icon(icon, size)
+    if resolved:
+        key, source, render = resolved
+        try:
+            pixbuf = cached_raster(key, source, size, render) if key else render()
+            # theme icons are keyed by name & file: the cache gets cleared on theme changes instead
+            return pixbuf, source if key == source else None
+        except:
+            pass
+
+    return GdkPixbuf.Pixbuf.new_from_file_at_size(icon_missing, size, size), icon_missing
+
+
+# magic, source mtime, width, height, rowstride, has alpha; followed by 8-bit RGB(A) pixel data
+RASTER_HEADER = "<8sqiiiB"
+RASTER_MAGIC = b"NWGCCPX1"
+
+
+def resolve_icon(icon, size):
+    """
+    Where load_pixbuf (and prerender_icons) take the icon from, w/o loading anything: a full path, an svg file of
+    such name in the custom icons path, or the GTK icon theme
+    :return: (raster cache key, source file, render function), or None if the icon not found; the key is None
+    if the icon may not be cached on disk
+    """
     # full path given
     if icon.startswith('/'):
         if shared.icons_path:
             icon = os.path.join(shared.icons_path, icon)
+        if not os.path.isfile(icon):
+            return None
+        return icon, icon, lambda: GdkPixbuf.Pixbuf.new_from_file_at_size(icon, size, size)
+
+    # In case someone wrote 'name.svg' instead of just 'name' in the "icons" dictionary (config_dir/config.json)
+    if icon.endswith(".svg"):
+        icon = "".join(icon.split(".")[:-1])
+    if shared.icons_path:
+        icon_svg = os.path.join(shared.icons_path, (icon + ".svg"))
+        if os.path.isfile(icon_svg):
+            return icon_svg, icon_svg, lambda: GdkPixbuf.Pixbuf.new_from_file_at_size(icon_svg, size, size)
+
+    # if a custom icon of such name does not exist, let's try using a GTK icon
+    info = shared.icon_theme.lookup_icon(icon, size, Gtk.IconLookupFlags.FORCE_SIZE)
+    if info is None:
+        return None
+    source = info.get_filename()
+
+    return "theme:{}:{}".format(icon, source) if source else None, source, info.load_icon
+
+
+def raster_path(key, size):
+    return os.path.join(shared.cache_dir, hashlib.sha1("{}:{}".format(key, size).encode()).hexdigest())
+
+
+def raster_current(key, source, size):
+    """
+    :return: True if the cache entry exists and is up to date; reads just the header
+    """
+    mtime = file_mtime(source)
+    try:
+        with open(raster_path(key, size), "rb") as f:
+            magic, cached_mtime = struct.unpack_from(RASTER_HEADER, f.read(struct.calcsize(RASTER_HEADER)))[:2]
+    except (OSError, struct.error):
+        return False
+
+    return magic == RASTER_MAGIC and cached_mtime == mtime
+
+
+def cached_raster(key, source, size, render):
+    """
+    Return raw pixels saved in the cache dir if still valid, otherwise `render()` and save the result
+    :param key: identifies the image, together with `size`
+    :param source: file the image comes from; the cache entry is valid as long as its mtime stays the same
+    """
+    mtime = file_mtime(source)
+    if not shared.cache_dir or mtime is None:
+        return render()
+
+    path = raster_path(key, size)
+    header_size = struct.calcsize(RASTER_HEADER)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, cached_mtime, width, height, rowstride, has_alpha = struct.unpack_from(RASTER_HEADER, data)
+        if magic == RASTER_MAGIC and cached_mtime == mtime:
+            return GdkPixbuf.Pixbuf.new_from_bytes(GLib.Bytes.new(data[header_size:]), GdkPixbuf.Colorspace.RGB,
+                                                   bool(has_alpha), 8, width, height, rowstride)
+    except (OSError, struct.error):
+        pass
+
+    pixbuf = render()
+    if pixbuf.get_bits_per_sample() == 8 and pixbuf.get_colorspace() == GdkPixbuf.Colorspace.RGB:
+        header = struct.pack(RASTER_HEADER, RASTER_MAGIC, mtime, pixbuf.get_width(), pixbuf.get_height(),
+                             pixbuf.get_rowstride(), pixbuf.get_has_alpha())
         try:
-            pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(icon, size, size)
-        except:
-            pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(os.path.join(shared.dirname, 'icons_light/icon-missing.svg'),
-                                                            size, size)
-    # just name given
-    else:
-        # In case someone wrote 'name.svg' instead of just 'name' in the "icons" dictionary (config_dir/config.json)
-        if icon.endswith(".svg"):
-            icon = "".join(icon.split(".")[:-1])
-        if shared.icons_path:
-            icon_svg = os.path.join(shared.icons_path, (icon + ".svg"))
-            try:
-                pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(icon_svg, size, size)
-            except:
-                try:
-                    # if a custom icon of such name does not exist, let's try using a GTK icon
-                    pixbuf = shared.icon_theme.load_icon(icon, size, Gtk.IconLookupFlags.FORCE_SIZE)
-                except:
-                    pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(
-                        os.path.join(shared.dirname, 'icons_light/icon-missing.svg'), size, size)
-        else:
-            try:
-                pixbuf = shared.icon_theme.load_icon(icon, size, Gtk.IconLookupFlags.FORCE_SIZE)
-            except:
-                pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(os.path.join(shared.dirname, 'icons_light/icon-missing.svg'),
-                                                            size, size)
+            with open(path + ".tmp", "wb") as f:
+                f.write(header)
+                f.write(pixbuf.get_pixels())
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            print("ERROR: couldn't save '{}': {}".format(path, e))
+
     return pixbuf
 
 
+def prerender_icons(icons, sizes):
+    """
+    Fill the on-disk raster cache for all the `icons` in all the `sizes`, one per main loop iteration when idle.
+    Icons displayed already, or cached and up to date, are skipped.
+    """
+    if not shared.cache_dir:
+        return
+    jobs = [(icon, size) for icon in icons if icon for size in sizes]
+
+    def step():
+        while jobs:
+            icon, size = jobs.pop()
+            if (icon, size, shared.icons_path) in pixbuf_cache:
+                continue
+            resolved = resolve_icon(icon, size)
+            if resolved is None or resolved[0] is None or raster_current(resolved[0], resolved[1], size):
+                continue
+            load_pixbuf(icon, size)
+            return True
+        return False
+
+    GLib.idle_add(step, priority=GLib.PRIORITY_LOW)
+
+
 def get_config_dir(data_dir):
     """
     Determine config dir path, create if not found, then create sub-dirs
@@ -90,6 +227,20 @@ def get_config_dir(data_dir):
     return config_dir
 
 
+def get_cache_dir():
+    """
+    Determine absolute path to $XDG_CACHE_HOME/nwgcc (raster icons cache), create if not found
+    """
+    xdg_cache_home = os.getenv('XDG_CACHE_HOME')
+    cache_home = xdg_cache_home if xdg_cache_home else os.path.join(os.getenv("HOME"), ".cache")
+    cache_dir = os.path.join(cache_home, "nwgcc")
+    if not os.path.isdir(cache_dir):
+        print("Creating '{}'".format(cache_dir))
+        os.makedirs(cache_dir)
+
+    return cache_dir
+
+
 def get_data_dir():
     """
     Determine absolute path to ~/.local/share/nwgcc, create if not found
@@ -158,6 +309,19 @@ def init_preferences(src_file, dest_file):
     return load_json(dest_file)
 
 
+def add_missing_preferences(users, default):
+    """
+    Fill keys missing from the user's preferences in with the default values, in place (not saved)
+    """
+    for section in default:
+        if not isinstance(users.get(section), dict):
+            users[section] = {}
+        for key, value in default[section].items():
+            if key not in users[section]:
+                print("Preference '{}' not found, using the default value".format(key))
+                users[section][key] = value
+
+
 def copy_files(src_dir, dest_dir):
     src_files = os.listdir(src_dir)
     for file in src_files:
@@ -167,47 +331,29 @@ def copy_files(src_dir, dest_dir):
 
 
 def get_volume(alt_cmd):
+    """
+    Parse the `amixer sget` output, if pyalsa not available (see mixer.py)
+    """
     vol = None
     switch = False
-    if py_alsa:
-        mixer = alsamixer.Mixer()
-        mixer.attach()
-        mixer.load()
-
-        element = alsamixer.Element(mixer, "Master")
-        max_vol = element.get_volume_range()[1]
-        vol = int(round(element.get_volume() * 100 / max_vol, 0))
-        switch = element.get_switch()
-        del mixer
-    else:
-        result = cmd2string(alt_cmd)
-        if result:
-            lines = result.splitlines()
-            for line in lines:
-                if "Front Left:" in line:
-                    try:
-                        vol = int(line.split()[4][1:-2])
-                    except:
-                        pass
-                    switch = "on" in line.split()[5]
-                    break
+    result = cmd2string(alt_cmd)
+    if result:
+        lines = result.splitlines()
+        for line in lines:
+            if "Front Left:" in line:
+                try:
+                    vol = int(line.split()[4][1:-2])
+                except:
+                    pass
+                switch = "on" in line.split()[5]
+                break
 
     return vol, switch
 
 
 def set_volume(percent, alt_cmd):
-    if py_alsa:
-        mixer = alsamixer.Mixer()
-        mixer.attach()
-        mixer.load()
-
-        element = alsamixer.Element(mixer, "Master")
-        max_vol = element.get_volume_range()[1]
-        element.set_volume_all(int(percent * max_vol / 100))
-        del mixer
-    else:
-        cmd = "{} {}% /dev/null 2>&1".format(alt_cmd, percent)
-        subprocess.call(cmd, shell=True)
+    cmd = "{} {}% /dev/null 2>&1".format(alt_cmd, percent)
+    run(cmd)
 
 
 def get_brightness(cmd):
@@ -222,7 +368,7 @@ def get_brightness(cmd):
 
 
 def set_brightness(cmd, value):
-    subprocess.call("{} {}".format(cmd, value), shell=True)
+    run("{} {}".format(cmd, value))
 
 
 def get_battery(cmd):
@@ -263,31 +409,20 @@ def get_battery(cmd):
     return msg, perc_val
 
 
-def bt_on(cmd):
-    output = subprocess.check_output(cmd, shell=True).decode("utf-8").strip()
-    return output == "yes"
-
-
-def bt_name(cmd):
-    output = subprocess.check_output(cmd, shell=True).decode("utf-8").strip()
-    return output
+def bt_status(status_cmd, name_cmd):
+    """
+    :return: powered, adapter name; both commands in one round trip to the shell coprocess
+    """
+    status, name = run_batch([status_cmd, name_cmd])
+    return status.output == "yes", name.output
 
 
 def bt_service_enabled(commands_dict):
     result, enabled, active = False, False, False
     if is_command(commands_dict["systemctl"]):
-        try:
-            enabled = subprocess.check_output("systemctl is-enabled bluetooth.service", shell=True).decode(
-                "utf-8").strip() == "enabled"
-        except subprocess.CalledProcessError:
-            # the command above returns the 'disabled` status w/ CalledProcessError, exit status 1
-            pass
-
-        try:
-            active = subprocess.check_output("systemctl is-active bluetooth.service", shell=True).decode(
-                "utf-8").strip() == "active"
-        except subprocess.CalledProcessError:
-            pass
+        # these return the 'disabled' / 'inactive' status w/ exit status other than 0
+        enabled = run("systemctl is-enabled bluetooth.service").output == "enabled"
+        active = run("systemctl is-active bluetooth.service").output == "active"
 
         result = enabled and active
 
@@ -295,30 +430,61 @@ def bt_service_enabled(commands_dict):
 
 
 def cmd2string(cmd):
-    try:
-        return subprocess.check_output(cmd, shell=True).decode("utf-8").strip()
-    except subprocess.CalledProcessError:
-        return ""
+    result = run(cmd)
+    return result.output if result.returncode == 0 else ""
+
+
+# `command -v` finds these, even if there's no such file in $PATH
+shell_builtins = {"echo", "printf", "test", "[", "read", "cd", "command", "type", "export", "set", "true", "false",
+                  "exec", "eval", "kill", "pwd", "wait"}
+
+# $PATH directory: (mtime, names of its entries); rebuilt when the directory mtime changes
+path_index = {}
+path_index_lock = threading.Lock()
+
+
+def find_executable(name):
+    """
+    `command -v` w/o a shell: looks `name` up in the index of $PATH directories
+    :return: full path or None
+    """
+    if "/" in name:
+        return name if os.path.isfile(name) and os.access(name, os.X_OK) else None
+
+    with path_index_lock:
+        for directory in os.getenv("PATH", os.defpath).split(os.pathsep):
+            if not directory:
+                continue
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+            entry = path_index.get(directory)
+            if entry is None or entry[0] != mtime:
+                try:
+                    # no stat calls here, just the directory listing
+                    entry = (mtime, {e.name for e in os.scandir(directory)})
+                except OSError:
+                    entry = (mtime, set())
+                path_index[directory] = entry
+
+            if name in entry[1]:
+                path = os.path.join(directory, name)
+                if os.path.isfile(path) and os.access(path, os.X_OK):
+                    return path
+
+    return None
 
 
 def is_command(cmd, verbose=False):
     cmd = cmd.split()[0]  # strip arguments
     if verbose:
         print("  '{}' ".format(cmd), end="")
-    cmd = "command -v {}".format(cmd)
-    try:
-        is_cmd = subprocess.check_output(cmd, shell=True).decode("utf-8").strip()
-        if is_cmd:
-            if verbose:
-                print("found")
-
-            return True
-
-    except subprocess.CalledProcessError:
-        if verbose:
-            print("not found!")
+    found = cmd in shell_builtins or find_executable(cmd) is not None
+    if verbose:
+        print("found" if found else "not found!")
 
-        return False
+    return found
 
 
 def check_all_commands(commands_dict):
@@ -330,12 +496,19 @@ def check_all_commands(commands_dict):
             commands.append(command)
     for command in commands:
         is_command(command, verbose=True)
+    from nwgcc.mixer import py_alsa
     if py_alsa:
         print("  'pyalsa' module found")
     else:
         print("  'pyalsa' module not found, trying 'amixer'")
 
 
+def print_pixbuf_cache_stats():
+    print("Pixbuf cache: {} hits, {} misses, {}/{} entries".format(pixbuf_cache_stats["hits"],
+                                                               pixbuf_cache_stats["misses"], len(pixbuf_cache),
+                                                               pixbuf_cache_size))
+
+
 def load_json(path):
     """
     :param path: patch to a json file
@@ -375,6 +548,60 @@ def parse_cli_commands(path):
     return lines
 
 
+# `every`: own refresh interval in seconds, or None to follow 'refresh_cli_seconds';
+# `timeout` in seconds, or None for the 'command_timeout_seconds' preference
+CliCommand = namedtuple("CliCommand", ["command", "every", "timeout"])
+
+# trailing annotations, e.g. 'curl -s wttr.in?format=3  # @every 30m @timeout 5s'
+cli_annotations = re.compile(r"\s#\s*((?:@(?:every|timeout)\s+[\d.]+(?:ms|s|m|h)?\s*)+)$")
+
+
+def parse_duration(string):
+    """
+    :param string: e.g. '500ms', '10s', '30m', '1h'; seconds if no unit given
+    :return: seconds
+    """
+    match = re.match(r"^([\d.]+)(ms|s|m|h)?$", string)
+    value = float(match.group(1))
+    multiplier = {"ms": 0.001, "s": 1, None: 1, "m": 60, "h": 3600}[match.group(2)]
+
+    return value * multiplier
+
+
+def parse_cli_line(line):
+    """
+    :return: CliCommand w/ the annotations (if any) stripped from the command
+    """
+    every, timeout = None, None
+    match = cli_annotations.search(line)
+    if match:
+        line = line[:match.start()].strip()
+        words = match.group(1).split()
+        for name, value in zip(words[::2], words[1::2]):
+            try:
+                seconds = parse_duration(value)
+            except (AttributeError, ValueError):
+                print("ERROR: invalid duration '{}'".format(value))
+                continue
+            if name == "@every":
+                every = seconds
+            else:
+                timeout = seconds
+
+    return CliCommand(line, every, timeout)
+
+
+def run_cli_command(cli_command):
+    """
+    :return: output, '' if the command failed (non-zero exit status), None if it timed out
+    """
+    result = run(cli_command.command, timeout=cli_command.timeout)
+    if result.timed_out:
+        return None
+
+    return result.output if result.returncode == 0 else ""
+
+
 def load_cli_commands(path):
     try:
         with open(path, 'r') as file:
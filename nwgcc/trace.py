@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+"""
+Spans recorded in the Chrome trace event format (--trace FILE), to be opened in chrome://tracing or
+https://ui.perfetto.dev. Format: https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# trace file path, None if tracing disabled
+path = None
+events = []
+# ids of threads we've already named in the trace
+named_threads = set()
+
+
+def enable(file):
+    global path
+    path = file
+    atexit.register(save)
+
+
+def complete(name, category, start, end=None, args=None):
+    """
+    Record a span; `start` and `end` are time.perf_counter() values
+    """
+    if path is None:
+        return
+    if end is None:
+        end = time.perf_counter()
+
+    pid, tid = os.getpid(), threading.get_ident()
+    if tid not in named_threads:
+        named_threads.add(tid)
+        events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                       "args": {"name": threading.current_thread().name}})
+
+    event = {"name": name, "cat": category, "ph": "X", "ts": start * 1000000, "dur": (end - start) * 1000000,
+             "pid": pid, "tid": tid}
+    if args:
+        event["args"] = args
+    events.append(event)
+
+
+@contextmanager
+def span(name, category, **args):
+    """
+    Record the time spent in the `with` block. Yields the `args` dictionary, so that the block may add
+    its results, e.g. the exit code.
+    """
+    if path is None:
+        yield args
+        return
+
+    start = time.perf_counter()
+    try:
+        yield args
+    finally:
+        complete(name, category, start, args=args)
+
+
+def save():
+    if path is None:
+        return
+    try:
+        with open(path, "w") as f:
+            json.dump({"traceEvents": list(events), "displayTimeUnit": "ms"}, f)
+        print("Trace saved to '{}'".format(path))
+    except OSError as e:
+        print("ERROR: couldn't save trace: {}".format(e))
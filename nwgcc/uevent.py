@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import socket
+
+from gi.repository import GLib
+
+NETLINK_KOBJECT_UEVENT = 15
+
+monitor = None
+
+
+class UeventMonitor(object):
+    """
+    Listens to kernel uevents (the same source udev uses), and calls callbacks registered for
+    the event subsystem (e.g. 'backlight', 'power_supply') in the GLib main loop.
+    """
+    def __init__(self):
+        self.callbacks = {}
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+        # pid 0: let the kernel assign the port; group 1: kernel events
+        self.sock.bind((0, 1))
+        self.sock.setblocking(False)
+        GLib.io_add_watch(self.sock.fileno(), GLib.PRIORITY_DEFAULT, GLib.IO_IN, self.on_readable)
+
+    def connect(self, subsystem, callback):
+        """
+        :param subsystem: e.g. 'backlight'
+        :param callback: called with the event dictionary (ACTION, DEVPATH, SUBSYSTEM...)
+        """
+        self.callbacks.setdefault(subsystem, []).append(callback)
+
+    def on_readable(self, source, condition):
+        while True:
+            try:
+                data = self.sock.recv(16384)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                print("ERROR: uevent socket: {}".format(e))
+                break
+            event = parse_uevent(data)
+            for callback in self.callbacks.get(event.get("SUBSYSTEM"), []):
+                callback(event)
+
+        return True
+
+
+def parse_uevent(data):
+    """
+    :param data: 'action@devpath\\0KEY=value\\0...' as received from the kernel
+    :return: dict
+    """
+    event = {}
+    for field in data.decode("utf-8", errors="replace").split("\0"):
+        if "=" in field:
+            key, value = field.split("=", 1)
+            event[key] = value
+
+    return event
+
+
+def connect(subsystem, callback):
+    """
+    Register `callback` for uevents of `subsystem`, create the monitor on first use
+    :return: False if kernel uevents are not available (e.g. in a container)
+    """
+    global monitor
+    if monitor is None:
+        try:
+            monitor = UeventMonitor()
+        except OSError as e:
+            print("Kernel uevents not available: {}".format(e))
+            monitor = False
+    if monitor:
+        monitor.connect(subsystem, callback)
+
+    return bool(monitor)
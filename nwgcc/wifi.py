@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+import array
+import fcntl
+import os
+import socket
+import struct
+
+from gi.repository import GLib
+
+sysfs_dir = "/sys/class/net"
+proc_wireless = "/proc/net/wireless"
+
+SIOCGIWESSID = 0x8B1B
+IW_ESSID_MAX_SIZE = 32
+# char ifr_name[IFNAMSIZ]; struct iw_point {void *pointer; __u16 length; __u16 flags;}
+IWREQ_FORMAT = "16sPHH"
+IWREQ_SIZE = 32
+
+NETLINK_ROUTE = 0
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+
+# cfg80211 reports the link quality in the 0-70 range
+MAX_QUALITY = 70
+
+link_monitor = None
+
+
+def wireless_interfaces():
+    """
+    :return: names of wireless network interfaces, e.g. ['wlan0']
+    """
+    try:
+        names = sorted(os.listdir(sysfs_dir))
+    except OSError:
+        return []
+
+    return [name for name in names if os.path.isdir(os.path.join(sysfs_dir, name, "wireless"))]
+
+
+def get_ssid(interface):
+    """
+    What `iwgetid -r` does, w/o a process: the SIOCGIWESSID ioctl
+    :return: SSID or '' if not connected
+    """
+    buffer = array.array("B", bytes(IW_ESSID_MAX_SIZE + 1))
+    address, length = buffer.buffer_info()
+    request = struct.pack(IWREQ_FORMAT, interface.encode(), address, length, 0)
+    request += bytes(IWREQ_SIZE - len(request))
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        result = fcntl.ioctl(sock.fileno(), SIOCGIWESSID, request)
+    length = struct.unpack(IWREQ_FORMAT, result[:struct.calcsize(IWREQ_FORMAT)])[2]
+
+    return buffer[:length].tobytes().rstrip(b"\0").decode("utf-8", errors="replace")
+
+
+def get_signal(interface):
+    """
+    :return: link quality percentage from /proc/net/wireless, or None if not found
+    """
+    try:
+        with open(proc_wireless) as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+
+    # 'wlan0: 0000   56.  -54.  -256        0      0      0      0     17        0'
+    for line in lines[2:]:
+        parts = line.split()
+        if parts and parts[0] == interface + ":":
+            try:
+                return min(int(float(parts[2]) * 100 / MAX_QUALITY), 100)
+            except (IndexError, ValueError):
+                return None
+
+    return None
+
+
+def wifi_status(interfaces):
+    """
+    :return: SSID and signal percentage of the first connected interface, or '', None
+    """
+    for interface in interfaces:
+        try:
+            ssid = get_ssid(interface)
+        except OSError:
+            continue
+        if ssid:
+            return ssid, get_signal(interface)
+
+    return "", None
+
+
+class LinkMonitor(object):
+    """
+    Listens to rtnetlink link and address notifications, calls callbacks in the GLib main loop
+    """
+    def __init__(self):
+        self.callbacks = []
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+        self.sock.bind((0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR))
+        self.sock.setblocking(False)
+        GLib.io_add_watch(self.sock.fileno(), GLib.PRIORITY_DEFAULT, GLib.IO_IN, self.on_readable)
+
+    def on_readable(self, source, condition):
+        # we don't need the details, just drain the socket
+        try:
+            while self.sock.recv(65536):
+                pass
+        except BlockingIOError:
+            pass
+        except OSError as e:
+            print("ERROR: rtnetlink socket: {}".format(e))
+
+        for callback in self.callbacks:
+            callback()
+
+        return True
+
+
+def watch_links(callback):
+    """
+    Call `callback` whenever a network link goes up / down or an address changes
+    :return: False if rtnetlink notifications are not available
+    """
+    global link_monitor
+    if link_monitor is None:
+        try:
+            link_monitor = LinkMonitor()
+        except OSError as e:
+            print("Link notifications not available: {}".format(e))
+            link_monitor = False
+    if link_monitor:
+        link_monitor.callbacks.append(callback)
+
+    return bool(link_monitor)
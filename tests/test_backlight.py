@@ -0,0 +1,73 @@
+import pytest
+
+from nwgcc import backlight
+from nwgcc.backlight import Backlight, find_backlight
+
+
+@pytest.fixture
+def sysfs(tmp_path, monkeypatch):
+    monkeypatch.setattr(backlight, "sysfs_dir", str(tmp_path))
+
+    def add(name, brightness, max_brightness, device_type=None, actual=None):
+        path = tmp_path / name
+        path.mkdir()
+        (path / "brightness").write_text("{}\n".format(brightness))
+        (path / "max_brightness").write_text("{}\n".format(max_brightness))
+        if device_type:
+            (path / "type").write_text("{}\n".format(device_type))
+        if actual is not None:
+            (path / "actual_brightness").write_text("{}\n".format(actual))
+        return path
+
+    return add
+
+
+def test_read(sysfs):
+    path = sysfs("intel_backlight", 4800, 96000)
+    device = Backlight(str(path))
+    assert device.name == "intel_backlight"
+    assert device.max == 96000
+    assert device.get() == 5
+    # sysfs attributes are read from offset 0 each time
+    (path / "brightness").write_text("48000\n")
+    assert device.get() == 50
+
+
+def test_actual_brightness(sysfs):
+    path = sysfs("acpi_video0", 10, 10, actual=3)
+    assert Backlight(str(path)).get() == 30
+
+
+def test_write(sysfs):
+    path = sysfs("intel_backlight", 0, 937)
+    device = Backlight(str(path))
+    assert device.writable
+    device.set(50)
+    assert (path / "brightness").read_text().startswith("468")
+
+
+def test_preferred_type(sysfs):
+    sysfs("acpi_video0", 5, 10, device_type="firmware")
+    sysfs("amdgpu_bl0", 100, 255, device_type="raw")
+    sysfs("dell_backlight", 5, 10, device_type="platform")
+    assert find_backlight().name == "acpi_video0"
+
+
+def test_unknown_type_last(sysfs):
+    sysfs("a_device", 5, 10)
+    sysfs("b_device", 100, 255, device_type="raw")
+    assert find_backlight().name == "b_device"
+
+
+def test_skip_broken(sysfs):
+    sysfs("a_device", 5, 0, device_type="firmware")
+    path = sysfs("b_device", 5, 10, device_type="firmware")
+    (path / "max_brightness").write_text("\n")
+    sysfs("c_device", 5, 10, device_type="raw")
+    assert find_backlight().name == "c_device"
+
+
+def test_no_device(sysfs, monkeypatch, tmp_path):
+    assert find_backlight() is None
+    monkeypatch.setattr(backlight, "sysfs_dir", str(tmp_path / "missing"))
+    assert find_backlight() is None
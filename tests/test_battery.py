@@ -0,0 +1,88 @@
+import pytest
+
+from nwgcc import battery
+from nwgcc.battery import Battery, get_batteries, battery_status, on_battery
+
+
+@pytest.fixture
+def sysfs(tmp_path, monkeypatch):
+    monkeypatch.setattr(battery, "sysfs_dir", str(tmp_path))
+
+    def add(name, **values):
+        path = tmp_path / name
+        path.mkdir()
+        lines = ["POWER_SUPPLY_{}={}".format(key, value) for key, value in values.items()]
+        (path / "uevent").write_text("\n".join(lines) + "\n")
+
+    return add
+
+
+def test_energy_battery(sysfs):
+    sysfs("BAT0", TYPE="Battery", STATUS="Discharging", PRESENT=1, CAPACITY=87, ENERGY_NOW=43500000,
+          ENERGY_FULL=50000000, POWER_NOW=10000000)
+    assert get_batteries() == [Battery("BAT0", 87, "discharging", 43500000, 50000000, 10000000)]
+
+
+def test_charge_battery(sysfs):
+    # µAh and µA, at 12 V
+    sysfs("BAT1", TYPE="Battery", STATUS="Charging", CHARGE_NOW=2000000, CHARGE_FULL=4000000, CURRENT_NOW=-1000000,
+          VOLTAGE_NOW=12000000)
+    assert get_batteries() == [Battery("BAT1", 50, "charging", 24000000, 48000000, 12000000)]
+
+
+def test_skipped(sysfs):
+    sysfs("AC", TYPE="Mains", ONLINE=1)
+    sysfs("hidpp_battery_0", TYPE="Battery", SCOPE="Device", STATUS="Discharging", CAPACITY=50)
+    sysfs("BAT1", TYPE="Battery", PRESENT=0)
+    sysfs("BAT0", TYPE="Battery", STATUS="Not charging", CAPACITY=80)
+    assert [(b.name, b.state) for b in get_batteries()] == [("BAT0", "pending-charge")]
+
+
+def test_no_sysfs(monkeypatch, tmp_path):
+    monkeypatch.setattr(battery, "sysfs_dir", str(tmp_path / "missing"))
+    assert get_batteries() == []
+    assert not on_battery()
+
+
+def test_status_none():
+    assert battery_status([]) == ("", 0, "")
+
+
+def test_status_single():
+    msg, perc_val, details = battery_status([Battery("BAT0", 87, "discharging", 43500000, 50000000, 10000000)])
+    assert msg == "87% discharging 4.3 hours"
+    assert perc_val == 87
+    assert details == "BAT0: 87% discharging 4.3 hours"
+
+
+def test_status_aggregate():
+    batteries = [Battery("BAT0", 100, "fully-charged", 50000000, 50000000, 0),
+                 Battery("BAT1", 20, "discharging", 5000000, 25000000, 10000000)]
+    msg, perc_val, details = battery_status(batteries)
+    # energy weighted, the total time to empty
+    assert perc_val == 73
+    assert msg == "73% discharging 5.5 hours"
+    assert details == "BAT0: 100% fully-charged\nBAT1: 20% discharging 30.0 minutes"
+
+
+def test_status_without_energy():
+    batteries = [Battery("BAT0", 90, "charging", None, None, None), Battery("BAT1", 61, "charging", None, None, None)]
+    assert battery_status(batteries) == ("76% charging", 76, "BAT0: 90% charging\nBAT1: 61% charging")
+
+
+def test_on_battery(sysfs):
+    sysfs("AC", TYPE="Mains", ONLINE=0)
+    sysfs("BAT0", TYPE="Battery", STATUS="Discharging", CAPACITY=50)
+    assert on_battery()
+
+
+def test_on_mains(sysfs):
+    sysfs("AC", TYPE="Mains", ONLINE=1)
+    sysfs("BAT0", TYPE="Battery", STATUS="Discharging", CAPACITY=50)
+    assert not on_battery()
+
+
+def test_on_battery_ignores_devices(sysfs):
+    sysfs("BAT0", TYPE="Battery", STATUS="Full", CAPACITY=100)
+    sysfs("hidpp_battery_0", TYPE="Battery", SCOPE="Device", STATUS="Discharging", CAPACITY=50)
+    assert not on_battery()
@@ -0,0 +1,188 @@
+import shutil
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("gi")
+from gi.repository import Gio, GLib
+
+from nwgcc.bluez import BluezAdapter, get_adapter, BLUEZ_NAME, ADAPTER_INTERFACE, OBJECT_MANAGER_INTERFACE
+
+if not shutil.which("dbus-daemon"):
+    pytest.skip("dbus-daemon not found", allow_module_level=True)
+
+ROOT_XML = """<node>
+  <interface name="org.freedesktop.DBus.ObjectManager">
+    <method name="GetManagedObjects">
+      <arg name="objects" type="a{oa{sa{sv}}}" direction="out"/>
+    </method>
+    <signal name="InterfacesAdded">
+      <arg name="object" type="o"/>
+      <arg name="interfaces" type="a{sa{sv}}"/>
+    </signal>
+    <signal name="InterfacesRemoved">
+      <arg name="object" type="o"/>
+      <arg name="interfaces" type="as"/>
+    </signal>
+  </interface>
+</node>"""
+
+ADAPTER_XML = """<node>
+  <interface name="org.bluez.Adapter1">
+    <property name="Powered" type="b" access="readwrite"/>
+    <property name="Alias" type="s" access="readwrite"/>
+  </interface>
+</node>"""
+
+FLAGS = Gio.DBusConnectionFlags.AUTHENTICATION_CLIENT | Gio.DBusConnectionFlags.MESSAGE_BUS_CONNECTION
+
+
+def connect(address):
+    return Gio.DBusConnection.new_for_address_sync(address, FLAGS, None, None)
+
+
+def wait_for(condition, timeout=5):
+    """
+    Iterate the default main context, where the adapter's signals are dispatched, until `condition()`
+    """
+    context = GLib.MainContext.default()
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            raise AssertionError("timed out")
+        context.iteration(False)
+        time.sleep(0.01)
+
+
+class MockBluez(object):
+    """
+    org.bluez service w/ an object manager at '/', and Adapter1 objects; served from its own thread and main
+    context, so that the adapter's synchronous calls get answered
+    """
+    def __init__(self, address):
+        # path: {property name: GLib.Variant}
+        self.adapters = {}
+        self.context = GLib.MainContext()
+        self.loop = GLib.MainLoop(self.context)
+        self.connection = None
+        ready = threading.Event()
+        self.thread = threading.Thread(target=self.serve, args=(address, ready), daemon=True)
+        self.thread.start()
+        assert ready.wait(5)
+
+    def serve(self, address, ready):
+        self.context.push_thread_default()
+        self.connection = connect(address)
+        self.connection.register_object("/", Gio.DBusNodeInfo.new_for_xml(ROOT_XML).interfaces[0],
+                                        self.on_method_call, None, None)
+        self.connection.call_sync("org.freedesktop.DBus", "/org/freedesktop/DBus", "org.freedesktop.DBus",
+                                  "RequestName", GLib.Variant("(su)", (BLUEZ_NAME, 0)), None,
+                                  Gio.DBusCallFlags.NONE, -1, None)
+        ready.set()
+        self.loop.run()
+        self.context.pop_thread_default()
+
+    def invoke(self, function, *args):
+        """
+        Run `function(*args)` in the service thread, and wait for it
+        """
+        done = threading.Event()
+
+        def callback():
+            function(*args)
+            done.set()
+            return False
+
+        self.context.invoke_full(GLib.PRIORITY_DEFAULT, callback)
+        assert done.wait(5)
+
+    def on_method_call(self, connection, sender, path, interface, method, parameters, invocation):
+        objects = {path: {ADAPTER_INTERFACE: properties} for path, properties in self.adapters.items()}
+        invocation.return_value(GLib.Variant("(a{oa{sa{sv}}})", (objects,)))
+
+    def on_get_property(self, connection, sender, path, interface, name):
+        return self.adapters[path][name]
+
+    def add_adapter(self, path, powered=True, alias="laptop"):
+        self.invoke(self.register_adapter, path, powered, alias)
+
+    def register_adapter(self, path, powered, alias):
+        self.adapters[path] = {"Powered": GLib.Variant("b", powered), "Alias": GLib.Variant("s", alias)}
+        self.connection.register_object(path, Gio.DBusNodeInfo.new_for_xml(ADAPTER_XML).interfaces[0], None,
+                                        self.on_get_property, None)
+        self.connection.emit_signal(None, "/", OBJECT_MANAGER_INTERFACE, "InterfacesAdded",
+                                    GLib.Variant("(oa{sa{sv}})", (path, {ADAPTER_INTERFACE: self.adapters[path]})))
+
+    def set_property(self, path, name, value):
+        self.adapters[path][name] = value
+        self.connection.emit_signal(None, path, "org.freedesktop.DBus.Properties", "PropertiesChanged",
+                                    GLib.Variant("(sa{sv}as)", (ADAPTER_INTERFACE, {name: value}, [])))
+
+    def stop(self):
+        self.context.invoke_full(GLib.PRIORITY_DEFAULT, self.loop.quit)
+        self.thread.join(5)
+        self.connection.close_sync(None)
+
+
+@pytest.fixture
+def address():
+    bus = Gio.TestDBus.new(Gio.TestDBusFlags.NONE)
+    bus.up()
+    yield bus.get_bus_address()
+    bus.down()
+
+
+@pytest.fixture
+def bluez(address):
+    service = MockBluez(address)
+    yield service
+    service.stop()
+
+
+@pytest.fixture
+def bus(address):
+    connection = connect(address)
+    yield connection
+    connection.close_sync(None)
+
+
+def test_no_bluez(bus):
+    assert get_adapter(bus) is None
+
+
+def test_no_adapter(bluez, bus):
+    assert get_adapter(bus) is None
+
+
+def test_adapter(bluez, bus):
+    bluez.add_adapter("/org/bluez/hci0", powered=True, alias="laptop")
+    adapter = get_adapter(bus)
+    assert adapter.powered()
+    assert adapter.name() == "laptop"
+
+
+def test_properties_changed(bluez, bus):
+    bluez.add_adapter("/org/bluez/hci0")
+    adapter = get_adapter(bus)
+    calls = []
+    adapter.watch(lambda: calls.append(adapter.powered()))
+
+    bluez.set_property("/org/bluez/hci0", "Powered", GLib.Variant("b", False))
+    wait_for(lambda: calls)
+    assert calls == [False]
+    assert not adapter.powered()
+
+
+def test_adapter_plugged(bluez, bus):
+    adapter = BluezAdapter(bus)
+    assert adapter.proxy is None
+    assert not adapter.powered()
+    assert adapter.name() == ""
+    calls = []
+    adapter.watch(lambda: calls.append(True))
+
+    bluez.add_adapter("/org/bluez/hci0", alias="dongle")
+    wait_for(lambda: calls)
+    assert adapter.powered()
+    assert adapter.name() == "dongle"
@@ -0,0 +1,72 @@
+import os
+import time
+
+import pytest
+
+from nwgcc.coprocess import ShellWorker
+
+
+@pytest.fixture
+def worker():
+    worker = ShellWorker()
+    yield worker
+    worker.stop()
+
+
+def test_batch(worker):
+    results = worker.run_batch(["echo one", "printf 'two\\nlines'", "exit 3", "echo $((1 + 2)) | tr 3 x"], timeout=5)
+    assert [(output, returncode, timed_out) for output, returncode, timed_out, seconds in results] == [
+        ("one", 0, False), ("two\nlines", 0, False), ("", 3, False), ("x", 0, False)]
+
+
+def test_commands_do_not_affect_each_other(worker):
+    results = worker.run_batch(["cd /; FOO=bar", "pwd; echo \"$FOO\""], timeout=5)
+    assert results[1][0] == os.getcwd()
+
+
+def test_trailing_comment(worker):
+    results = worker.run_batch(["echo one # comment", "echo two"], timeout=5)
+    assert [result[0] for result in results] == ["one", "two"]
+
+
+@pytest.mark.parametrize("command", ["echo 'unterminated", "echo \"it's", "echo $(", "echo foo \\"])
+def test_syntax_error_does_not_hang(worker, command):
+    results = worker.run_batch([command, "echo next"], timeout=3)
+    assert not results[0][2]
+    assert results[0][3] < 3
+    # the shell is still in sync
+    assert results[1][:3] == ("next", 0, False)
+
+
+def test_syntax_error_without_timeout(worker):
+    results = worker.run_batch(["echo 'unterminated"], timeout=None)
+    assert results[0][1] == 2
+
+
+def test_timeout(worker):
+    results = worker.run_batch(["sleep 10", "echo skipped"], timeout=0.5)
+    assert results[0][1:3] == (-9, True)
+    assert results[1][1] == -1
+    # restarted w/ the next batch
+    assert worker.run_batch(["echo again"], timeout=5)[0][0] == "again"
+
+
+def test_shell_died(worker):
+    results = worker.run_batch(["kill -9 $$", "echo skipped"], timeout=5)
+    assert [result[1] for result in results] == [-1, -1]
+    assert worker.run_batch(["echo again"], timeout=5)[0][0] == "again"
+
+
+def test_background_job_output(worker):
+    results = worker.run_batch(["(sleep 0.2; echo LATE) &", "echo a"], timeout=5)
+    assert [result[0] for result in results] == ["", "a"]
+    time.sleep(0.4)
+    assert worker.run_batch(["echo b"], timeout=5)[0][0] == "b"
+
+
+def test_output_files_removed(worker):
+    worker.run_batch(["echo one", "echo two"], timeout=5)
+    assert os.listdir(worker.dir) == []
+    directory = worker.dir
+    worker.run_batch(["sleep 10", "echo skipped"], timeout=0.3)
+    assert not os.path.exists(directory)
@@ -0,0 +1,69 @@
+import socket
+import time
+
+import pytest
+
+pytest.importorskip("gi")
+from gi.repository import GLib
+
+from nwgcc.daemon import DaemonServer, send_message, socket_path
+
+
+def pump(condition, timeout=5):
+    context = GLib.MainContext.default()
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            raise AssertionError("timed out")
+        context.iteration(False)
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    messages = []
+    server = DaemonServer(messages.append)
+    server.messages = messages
+    yield server
+    server.close()
+
+
+def test_message(server):
+    assert send_message("toggle")
+    pump(lambda: server.messages)
+    assert server.messages == ["toggle"]
+    assert not server.clients
+
+
+def test_no_server(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    assert not send_message("show")
+
+
+def test_silent_client(server):
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(socket_path())
+    pump(lambda: server.clients)
+
+    # the main loop is not held up by the client
+    start = time.monotonic()
+    assert send_message("show")
+    pump(lambda: server.messages)
+    assert time.monotonic() - start < 0.5
+    assert server.messages == ["show"]
+
+    # dropped after a while
+    pump(lambda: not server.clients)
+    client.close()
+
+
+def test_message_in_parts(server):
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(socket_path())
+    client.sendall(b"sett")
+    pump(lambda: server.clients and server.clients[list(server.clients)[0]][0])
+    client.sendall(b"ings")
+    client.close()
+    pump(lambda: server.messages)
+    assert server.messages == ["settings"]
@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("gi")
+from gi.repository import GLib
+
+from nwgcc import trace
+from nwgcc.engine import ProbeEngine, probe_name
+
+
+def pump(condition, timeout=5):
+    """
+    Iterate the default main context, where results are delivered, until `condition()`
+    """
+    context = GLib.MainContext.default()
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            raise AssertionError("timed out")
+        context.iteration(False)
+        time.sleep(0.005)
+
+
+def test_result_delivered():
+    engine = ProbeEngine(workers=1)
+    results = []
+    assert engine.submit("key", lambda a, b: a + b, results.append, 1, 2)
+    pump(lambda: results)
+    assert results == [3]
+    assert not engine.pending
+
+
+def test_requests_coalesced():
+    engine = ProbeEngine(workers=2)
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def probe(value):
+        calls.append(value)
+        release.wait(5)
+        return value
+
+    assert engine.submit("key", probe, results.append, 1)
+    # the same key pending: postponed, the latest request replaces the previous ones
+    assert not engine.submit("key", probe, results.append, 2)
+    assert not engine.submit("key", probe, results.append, 3)
+    # other keys are not held back
+    assert engine.submit("other", lambda: "other", results.append)
+    assert engine.requested["key"][2] == (3,)
+
+    release.set()
+    pump(lambda: len(results) == 3)
+    # give a wrongly repeated probe a chance to show up
+    for i in range(10):
+        GLib.MainContext.default().iteration(False)
+        time.sleep(0.01)
+    assert calls == [1, 3]
+    assert sorted(results, key=str) == [1, 3, "other"]
+    assert not engine.pending
+    assert not engine.requested
+
+
+def test_failed_probe():
+    engine = ProbeEngine(workers=1)
+    results = []
+
+    def probe():
+        raise ValueError("failed")
+
+    engine.submit("key", probe, results.append)
+    pump(lambda: not engine.pending)
+    assert results == []
+    # the key is free again
+    assert engine.submit("key", lambda: 1, results.append)
+    pump(lambda: results)
+    assert results == [1]
+
+
+class Row(object):
+    def probe(self):
+        return 1
+
+
+def test_probe_name():
+    assert probe_name(Row().probe) == "Row.probe"
+    assert probe_name(test_probe_name) == "test_probe_name"
+
+
+def test_trace_spans(monkeypatch, tmp_path):
+    monkeypatch.setattr(trace, "path", str(tmp_path / "trace.json"))
+    monkeypatch.setattr(trace, "events", [])
+    engine = ProbeEngine(workers=1)
+    results = []
+    # keys are often rows: spans are named after the probe, not the key
+    row = Row()
+    engine.submit(row, row.probe, results.append)
+    pump(lambda: results)
+    assert [event["name"] for event in trace.events if event["ph"] == "X"] == ["Row.probe"]
@@ -0,0 +1,138 @@
+import os
+import time
+
+import pytest
+
+gi = pytest.importorskip("gi")
+try:
+    gi.require_version("Gtk", "3.0")
+except ValueError:
+    pytest.skip("GTK 3 not available", allow_module_level=True)
+from gi.repository import GLib
+
+from nwgcc.mixer import PulseMixer, pulse_available
+
+# `pactl` stand-in: state in files next to it, `subscribe` prints what's written to the 'events' FIFO
+PACTL = """#!/bin/sh
+dir=$(dirname "$0")
+echo "$*" >> "$dir/calls"
+case "$1" in
+    subscribe) exec cat "$dir/events" ;;
+    get-sink-volume) echo "Volume: front-left: 32768 /  $(cat "$dir/volume")% / -18.06 dB" ;;
+    get-sink-mute) echo "Mute: $(cat "$dir/mute")" ;;
+    set-sink-volume) echo "${3%\\%}" > "$dir/volume" ;;
+    *) exit 1 ;;
+esac
+"""
+
+
+def pump(condition, timeout=5):
+    context = GLib.MainContext.default()
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            raise AssertionError("timed out")
+        context.iteration(False)
+        time.sleep(0.005)
+
+
+class Pactl(object):
+    def __init__(self, path):
+        self.dir = path
+        self.path = str(path / "pactl")
+        with open(self.path, "w") as f:
+            f.write(PACTL)
+        os.chmod(self.path, 0o755)
+        (path / "volume").write_text("50\n")
+        (path / "mute").write_text("no\n")
+        (path / "calls").write_text("")
+        os.mkfifo(str(path / "events"))
+        self.events = None
+
+    def connect(self):
+        # blocks until `pactl subscribe` opens the FIFO
+        self.events = open(str(self.dir / "events"), "w")
+
+    def event(self, line):
+        self.events.write(line + "\n")
+        self.events.flush()
+
+    def queries(self):
+        return (self.dir / "calls").read_text().count("get-sink-volume")
+
+    def close(self):
+        if self.events:
+            self.events.close()
+
+
+@pytest.fixture
+def pactl(tmp_path):
+    stub = Pactl(tmp_path)
+    yield stub
+    stub.close()
+
+
+@pytest.fixture
+def mixer(pactl):
+    mixer = PulseMixer(pactl.path)
+    mixer.own_event_seconds = 0.2
+    mixer.calls = []
+    assert mixer.watch(lambda: mixer.calls.append(True))
+    pactl.connect()
+    yield mixer
+    mixer.process.kill()
+    mixer.process.wait()
+
+
+def test_cached(pactl, mixer):
+    assert mixer.get() == (50, True)
+    assert mixer.get() == (50, True)
+    assert pactl.queries() == 1
+
+
+def test_change_event(pactl, mixer):
+    assert mixer.get() == (50, True)
+    (pactl.dir / "mute").write_text("yes\n")
+    # not ours
+    pactl.event("Event 'new' on client #12")
+    pactl.event("Event 'change' on sink #56")
+    pump(lambda: mixer.calls)
+    assert mixer.calls == [True]
+    assert mixer.get() == (50, False)
+    assert pactl.queries() == 2
+
+
+def test_own_write(pactl, mixer):
+    assert mixer.get() == (50, True)
+    mixer.set(40)
+    # the mute key pressed right after the slider moved
+    (pactl.dir / "mute").write_text("yes\n")
+    pactl.event("Event 'change' on sink #56")
+    pactl.event("Event 'change' on sink #56")
+    start = time.monotonic()
+    pump(lambda: mixer.calls)
+    # once, after the writes settle
+    assert time.monotonic() - start > 0.1
+    assert mixer.calls == [True]
+    assert mixer.get() == (40, False)
+    assert pactl.queries() == 2
+
+
+def test_server_event_during_write(pactl, mixer):
+    mixer.set(40)
+    pactl.event("Event 'change' on server #-1")
+    pump(lambda: mixer.calls)
+    assert mixer.get() == (40, True)
+
+
+def test_available(pactl, tmp_path):
+    assert pulse_available(pactl.path)
+    assert not pulse_available(str(tmp_path / "missing"))
+
+
+def test_old_pactl(tmp_path):
+    # no get-sink-volume before PulseAudio 15
+    path = tmp_path / "pactl"
+    path.write_text("#!/bin/sh\n[ \"$1\" = info ]\n")
+    os.chmod(str(path), 0o755)
+    assert not pulse_available(str(path))
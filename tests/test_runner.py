@@ -0,0 +1,88 @@
+import time
+
+import pytest
+
+pytest.importorskip("gi")
+from nwgcc import runner
+from nwgcc.runner import split_command, run, run_batch, Result
+
+
+@pytest.fixture(params=[True, False], ids=["coprocess", "subprocess"])
+def use_coprocess(request, monkeypatch):
+    monkeypatch.setattr(runner, "use_coprocess", request.param)
+
+
+def test_exit_status(use_coprocess):
+    assert run("echo one | tr o 0") == Result("0ne", 0, False)
+    assert run("exit 3").returncode == 3
+
+
+def test_timeout(use_coprocess):
+    start = time.monotonic()
+    result = run("sleep 10; echo late", timeout=0.5)
+    assert result.timed_out
+    assert time.monotonic() - start < 3
+    assert run("echo again", timeout=3) == Result("again", 0, False)
+
+
+def test_timeout_kills_group(use_coprocess):
+    # the grandchild would keep the output pipe open, if not killed w/ the group
+    start = time.monotonic()
+    result = run("sh -c 'sleep 10; echo late' & sleep 10", timeout=0.5)
+    assert result.timed_out
+    assert time.monotonic() - start < 3
+
+
+def test_default_timeout(use_coprocess, monkeypatch):
+    monkeypatch.setattr(runner, "default_timeout", 0.5)
+    assert run("sleep 10").timed_out
+    # 0: no limit
+    monkeypatch.setattr(runner, "default_timeout", 0)
+    assert run("sleep 0.7; echo done") == Result("done", 0, False)
+
+
+@pytest.mark.parametrize("cmd, argv", [
+    ("light -G", ["light", "-G"]),
+    ("notify-send 'two words'", ["notify-send", "two words"]),
+    ("nm-connection-editor", ["nm-connection-editor"]),
+    # the shell needed
+    ("upower -i $(upower -e | grep BAT)", None),
+    ("echo $USER", None),
+    ("date > /tmp/date", None),
+    ("ls *.py", None),
+    ("! pgrep foo", None),
+    ("cd /tmp", None),
+    ("LANG=C date", None),
+    ("echo 'unterminated", None),
+    ("echo foo \\", None),
+    ("", None),
+])
+def test_split_command(cmd, argv):
+    assert split_command(cmd) == argv
+
+
+def test_run_direct():
+    assert run("echo one two") == Result("one two", 0, False)
+    assert run(["printf", "%s", "a b"], shell=False) == Result("a b", 0, False)
+    assert run("! false").returncode == 0
+
+
+def test_not_found():
+    assert run("nwgcc-no-such-command").returncode == 127
+
+
+def test_batch():
+    results = run_batch(["echo one", "echo $((2 * 3))", "exit 1"], timeout=3)
+    assert results == [Result("one", 0, False), Result("6", 0, False), Result("", 1, False)]
+
+
+@pytest.mark.parametrize("cmd", ["echo 'unterminated", "echo $(", "echo \"it's"])
+def test_syntax_error(use_coprocess, cmd):
+    result = run(cmd, timeout=3)
+    assert not result.timed_out
+    assert result.returncode == 2
+
+
+def test_commands_independent(use_coprocess):
+    assert run("cd / && pwd") == Result("/", 0, False)
+    assert run("pwd") != Result("/", 0, False)
@@ -0,0 +1,184 @@
+import pytest
+
+gi = pytest.importorskip("gi")
+try:
+    gi.require_version("Gdk", "3.0")
+    from gi.repository import Gdk  # noqa: F401
+except (ValueError, ImportError):
+    pytest.skip("GDK 3 not available", allow_module_level=True)
+
+from nwgcc import scheduler
+from nwgcc.scheduler import RefreshScheduler, RowTimer
+
+
+class Window(object):
+    def connect(self, signal, handler):
+        pass
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Seconds returned by time.monotonic() in the scheduler, to be moved forward by the test
+    """
+    now = [1000.0]
+    monkeypatch.setattr(scheduler.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def tasks(clock):
+    calls = []
+    refresh = RefreshScheduler(Window(), suspended=True)
+    refresh.add("slow", 5000, calls.append, "slow")
+    refresh.add("cli", 1800 * 1000, calls.append, "cli")
+    refresh.calls = calls
+    yield refresh
+    refresh.stop()
+
+
+def show(refresh):
+    refresh.on_map(None, None)
+
+
+def hide(refresh):
+    refresh.on_unmap(None, None)
+
+
+def test_catch_up_when_overdue(tasks, clock):
+    # shown right after the start: everything up to date
+    show(tasks)
+    assert tasks.calls == []
+    hide(tasks)
+
+    clock[0] += 10
+    show(tasks)
+    assert tasks.calls == ["slow"]
+    hide(tasks)
+
+    # not rerun each time the window pops up
+    clock[0] += 1
+    show(tasks)
+    assert tasks.calls == ["slow"]
+    hide(tasks)
+
+    clock[0] += 1800
+    show(tasks)
+    assert sorted(tasks.calls) == ["cli", "slow", "slow"]
+
+
+class Row(object):
+    def __init__(self):
+        self.updates = 0
+
+    def update(self):
+        self.updates += 1
+
+
+def test_row_catch_up(tasks, clock):
+    row = Row()
+    tasks.add_row(row, "row", 1000, 8000)
+    show(tasks)
+    assert row.updates == 0
+    hide(tasks)
+
+    clock[0] += 2
+    show(tasks)
+    assert row.updates == 1
+    hide(tasks)
+
+    # just caught up
+    show(tasks)
+    assert row.updates == 1
+
+
+def test_timer_run_counts(tasks, clock):
+    show(tasks)
+    clock[0] += 10
+    # the slow timer fired while visible
+    tasks.run_task(0)
+    hide(tasks)
+    clock[0] += 1
+    show(tasks)
+    assert tasks.calls == ["slow"]
+
+
+def test_factors(tasks, clock):
+    tasks.set_factors({"fast": 1, "slow": 2, "cli": 0})
+    clock[0] += 6
+    show(tasks)
+    assert tasks.calls == []
+    hide(tasks)
+    clock[0] += 1800
+    show(tasks)
+    # the 'cli' group turned off
+    assert tasks.calls == ["slow"]
+
+
+@pytest.fixture
+def row_timer(clock):
+    row_timer = RowTimer(Row(), "row", 1000, 8000)
+    yield row_timer
+    row_timer.stop()
+
+
+def test_backoff(row_timer):
+    row_timer.result({"value": 1})
+    assert row_timer.interval == 1000
+    intervals = []
+    for i in range(5):
+        row_timer.result({"value": 1})
+        intervals.append(row_timer.interval)
+    # capped at the maximum
+    assert intervals == [2000, 4000, 8000, 8000, 8000]
+
+
+def test_maximum_below_minimum():
+    row_timer = RowTimer(Row(), "row", 2000, 1000)
+    row_timer.result(1)
+    row_timer.result(1)
+    assert row_timer.interval == 2000
+
+
+def test_changed_values_reset(row_timer):
+    row_timer.result(1)
+    row_timer.result(1)
+    row_timer.result(1)
+    assert row_timer.interval == 4000
+    row_timer.result(2)
+    assert row_timer.interval == 1000
+    row_timer.result(2)
+    assert row_timer.interval == 2000
+
+
+def test_reset_restarts(row_timer):
+    row_timer.start()
+    row_timer.result(1)
+    row_timer.result(1)
+    source = row_timer.source
+    # e.g. the user moved a slider
+    row_timer.reset()
+    assert row_timer.interval == 1000
+    # not waiting for the backed off timeout
+    assert row_timer.source not in (None, source)
+
+
+def test_reset_stopped(row_timer):
+    row_timer.result(1)
+    row_timer.result(1)
+    row_timer.reset()
+    assert row_timer.interval == 1000
+    assert row_timer.source is None
+
+
+def test_timeout(row_timer, clock):
+    row_timer.factor = 2
+    row_timer.start()
+    clock[0] += 1
+    assert not row_timer.overdue()
+    clock[0] += 1
+    assert row_timer.overdue()
+    assert row_timer.on_timeout() is False
+    assert row_timer.row.updates == 1
+    assert row_timer.source is not None
+    assert not row_timer.overdue()
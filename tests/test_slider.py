@@ -0,0 +1,171 @@
+import sys
+import time
+
+import pytest
+
+gi = pytest.importorskip("gi")
+try:
+    gi.require_version("Gtk", "3.0")
+except ValueError:
+    pytest.skip("GTK 3 not available", allow_module_level=True)
+from gi.repository import Gtk, GLib
+
+if not Gtk.init_check(sys.argv)[0]:
+    pytest.skip("no display", allow_module_level=True)
+
+from nwgcc import main, shared
+from nwgcc.engine import ProbeEngine
+from nwgcc.scheduler import RowTimer
+from nwgcc.store import Store
+
+
+def pump(condition, timeout=5):
+    context = GLib.MainContext.default()
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            raise AssertionError("timed out")
+        context.iteration(False)
+        time.sleep(0.005)
+
+
+def settle(seconds=0.2):
+    """
+    Let anything that shouldn't happen, happen
+    """
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        GLib.MainContext.default().iteration(False)
+        time.sleep(0.005)
+
+
+class FakeScale(object):
+    """
+    Gtk.Scale stand-in: set_value emits 'value-changed', unless the handler is blocked
+    """
+    def __init__(self, callback):
+        self.value = 0
+        self.callback = callback
+        self.blocked = False
+
+    def get_value(self):
+        return self.value
+
+    def set_value(self, value):
+        if value != self.value:
+            self.value = value
+            if not self.blocked:
+                self.callback(self)
+
+    def handler_block(self, handler_id):
+        self.blocked = True
+
+    def handler_unblock(self, handler_id):
+        self.blocked = False
+
+
+class Mixer(object):
+    def __init__(self):
+        self.volume = 50
+        self.writes = []
+
+    def set(self, value):
+        self.writes.append(value)
+        self.volume = int(value)
+
+
+class Row(main.SliderRow):
+    def __init__(self, mixer):
+        main.SliderRow.__init__(self)
+        self.scale = FakeScale(self.on_value_changed)
+        self.mixer = mixer
+        shared.store.subscribe(["volume"], self.render)
+
+    def read(self):
+        return {"volume": self.mixer.volume}
+
+    def write(self, value):
+        self.mixer.set(value)
+
+    def render(self):
+        self.set_scale(shared.store.get("volume"))
+
+
+@pytest.fixture
+def row(monkeypatch):
+    monkeypatch.setattr(main, "preferences", {"slider_write_millis": 50})
+    monkeypatch.setattr(shared, "engine", ProbeEngine(workers=2))
+    monkeypatch.setattr(shared, "store", Store())
+    row = Row(Mixer())
+    row.update()
+    pump(lambda: row.scale.value == 50)
+    return row
+
+
+def idle(row):
+    return not shared.engine.pending and row.write_timer is None
+
+
+def test_refresh_does_not_write(row):
+    # refresh ticks w/ nothing changed
+    for i in range(5):
+        row.update()
+        pump(lambda: idle(row))
+    assert row.mixer.writes == []
+    assert row.writes == 0
+    assert row.updates == 1
+
+    # changed elsewhere: the slider follows, w/o writing the value back
+    row.mixer.volume = 30
+    row.update()
+    pump(lambda: row.scale.value == 30)
+    settle()
+    assert row.mixer.writes == []
+    assert row.writes == 0
+    assert row.updates == 2
+
+
+def test_user_change_written(row):
+    row.scale.set_value(40)
+    pump(lambda: row.mixer.writes)
+    settle()
+    assert row.mixer.writes == [40]
+    assert row.writes == 1
+    assert row.scale.value == 40
+
+
+def test_burst_collapsed(row):
+    row.scale.set_value(10)
+    pump(lambda: row.mixer.writes)
+    # dragged: all within 'slider_write_millis' of the previous write
+    for value in range(11, 31):
+        row.scale.set_value(value)
+    pump(lambda: len(row.mixer.writes) == 2)
+    settle()
+    assert row.mixer.writes == [10, 30]
+    assert row.writes == 2
+    # probe results from before the last write don't move the slider back
+    assert row.scale.value == 30
+
+
+def test_release_writes_at_once(row):
+    row.scale.set_value(10)
+    pump(lambda: row.mixer.writes)
+    row.on_button_press(None, None)
+    for value in range(11, 21):
+        row.scale.set_value(value)
+    row.on_button_release(None, None)
+    assert row.write_timer is None
+    pump(lambda: len(row.mixer.writes) == 2)
+    settle()
+    assert row.mixer.writes == [10, 20]
+
+
+def test_user_change_resets_timer(row):
+    timer = RowTimer(row, "volume", 1000, 8000)
+    timer.result(1)
+    timer.result(1)
+    assert timer.interval == 2000
+    row.scale.set_value(40)
+    assert timer.interval == 1000
+    pump(lambda: row.mixer.writes)
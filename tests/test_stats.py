@@ -0,0 +1,57 @@
+import pytest
+
+from nwgcc import stats
+
+
+@pytest.fixture(autouse=True)
+def clean():
+    stats.labels.clear()
+    stats.records.clear()
+    yield
+    stats.labels.clear()
+    stats.records.clear()
+
+
+def test_labels():
+    stats.register({"get_brightness": "light -G", "set_brightness": "light -S"}, ["date +%H:%M", "uptime"])
+    assert stats.get_label("light -G") == "get_brightness"
+    # setters are given arguments
+    assert stats.get_label("light -S 50") == "set_brightness"
+    assert stats.get_label("uptime") == "cli 2"
+    assert stats.get_label("pactl get-sink-volume @DEFAULT_SINK@") == "pactl"
+    assert stats.get_label(["pactl", "get-sink-mute", "@DEFAULT_SINK@"]) == "pactl get-sink-mute"
+    assert stats.get_label("") == ""
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert stats.percentile(values, 0.5) == 51
+    assert stats.percentile(values, 0.95) == 96
+    assert stats.percentile([7], 0.95) == 7
+
+
+def test_record():
+    for ms in range(1, 11):
+        stats.record("light -G", ms / 1000)
+    entry = stats.records["light"]
+    assert entry["count"] == 10
+    assert entry["max"] == pytest.approx(10)
+
+
+def test_samples_bounded():
+    for i in range(stats.SAMPLES + 10):
+        stats.record("uptime", 0.001)
+    assert stats.records["uptime"]["count"] == stats.SAMPLES + 10
+    assert len(stats.records["uptime"]["samples"]) == stats.SAMPLES
+
+
+def test_report():
+    stats.register({"get_battery": "upower -i"}, [])
+    stats.record("date", 0.002)
+    for i in range(20):
+        stats.record("upower -i", 0.5)
+    lines = stats.report()
+    assert lines[0].split() == ["command", "count", "p50", "ms", "p95", "ms", "max", "ms"]
+    # slowest first
+    assert lines[1].split() == ["get_battery", "20", "500.0", "500.0", "500.0", "SLOW"]
+    assert lines[2].split() == ["date", "1", "2.0", "2.0", "2.0"]
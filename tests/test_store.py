@@ -0,0 +1,54 @@
+import pytest
+
+from nwgcc.store import Store
+
+
+def test_get():
+    store = Store()
+    assert store.get("volume") is None
+    assert store.get("volume", 0) == 0
+    store.update({"volume": 50})
+    assert store.get("volume") == 50
+
+
+def test_callbacks_on_change_only():
+    store = Store()
+    calls = []
+    store.subscribe(["volume", "muted"], lambda: calls.append(store.get("volume")))
+
+    assert store.update({"volume": 50, "muted": False})
+    # once per update
+    assert calls == [50]
+    assert not store.update({"volume": 50, "muted": False})
+    assert calls == [50]
+    assert store.update({"volume": 60})
+    assert calls == [50, 60]
+    assert store.counters() == "5 values written, 3 changed"
+
+
+def test_first_none_is_a_change():
+    store = Store()
+    calls = []
+    store.subscribe(["ssid"], lambda: calls.append(True))
+    assert store.update({"ssid": None})
+    assert calls == [True]
+
+
+def test_other_keys():
+    store = Store()
+    calls = []
+    store.subscribe(["brightness"], lambda: calls.append(True))
+    store.update({"volume": 50, "cli:0": "12:00"})
+    assert calls == []
+
+
+def test_types():
+    store = Store()
+    with pytest.raises(TypeError):
+        store.update({"volume": "50"})
+    with pytest.raises(TypeError):
+        store.update({"cli:1": 3})
+    with pytest.raises(KeyError):
+        store.update({"volume_level": 50})
+    with pytest.raises(KeyError):
+        store.subscribe(["volume_level"], print)
@@ -0,0 +1,235 @@
+import os
+import struct
+
+import pytest
+
+gi = pytest.importorskip("gi")
+try:
+    gi.require_version("Gtk", "3.0")
+except ValueError:
+    pytest.skip("GTK 3 not available", allow_module_level=True)
+from nwgcc import shared, tools
+from nwgcc.tools import raster_current, raster_path, file_mtime, RASTER_HEADER, RASTER_MAGIC, find_executable, \
+    create_pixbuf, resolve_icon, add_missing_preferences, parse_duration, parse_cli_line, CliCommand, run_cli_command
+
+
+def test_raster_current(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared, "cache_dir", str(tmp_path))
+    source = tmp_path / "icon.svg"
+    source.write_text("<svg/>")
+    assert not raster_current(str(source), str(source), 16)
+
+    with open(raster_path(str(source), 16), "wb") as f:
+        f.write(struct.pack(RASTER_HEADER, RASTER_MAGIC, file_mtime(str(source)), 16, 16, 64, 1))
+        f.write(bytes(16 * 64))
+    assert raster_current(str(source), str(source), 16)
+    assert not raster_current(str(source), str(source), 24)
+
+    # the source modified
+    source.write_text("<svg></svg>")
+    stat = source.stat()
+    os.utime(str(source), ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+    assert not raster_current(str(source), str(source), 16)
+
+
+def add_executable(directory, name, mode=0o755):
+    path = directory / name
+    path.write_text("#!/bin/sh\n")
+    os.chmod(str(path), mode)
+    # a new mtime, even w/ a coarse timestamp granularity
+    stat = directory.stat()
+    os.utime(str(directory), ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+    return str(path)
+
+
+def test_find_executable(tmp_path, monkeypatch):
+    first, second = tmp_path / "first", tmp_path / "second"
+    first.mkdir()
+    second.mkdir()
+    monkeypatch.setenv("PATH", "{}:{}".format(first, second))
+    assert find_executable("nwgcc-test") is None
+
+    # the index of a modified directory is rebuilt
+    path = add_executable(second, "nwgcc-test")
+    assert find_executable("nwgcc-test") == path
+    # earlier $PATH entries first
+    path = add_executable(first, "nwgcc-test")
+    assert find_executable("nwgcc-test") == path
+
+    assert find_executable(path) == path
+    assert find_executable(str(first / "missing")) is None
+
+
+def test_find_executable_not_executable(tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", str(tmp_path))
+    add_executable(tmp_path, "nwgcc-test", mode=0o644)
+    assert find_executable("nwgcc-test") is None
+    os.mkdir(str(tmp_path / "nwgcc-dir"))
+    assert find_executable("nwgcc-dir") is None
+
+
+@pytest.fixture
+def pixbufs(tmp_path, monkeypatch):
+    """
+    create_pixbuf w/ a stand-in loader: icon names starting w/ '/' come from files, the others from the theme
+    :return: list of (icon, size) loaded
+    """
+    loaded = []
+
+    def load_pixbuf(icon, size):
+        loaded.append((icon, size))
+        return object(), icon if icon.startswith("/") else None
+
+    monkeypatch.setattr(tools, "load_pixbuf", load_pixbuf)
+    monkeypatch.setattr(tools, "pixbuf_cache", tools.OrderedDict())
+    monkeypatch.setattr(tools, "pixbuf_cache_stats", {"hits": 0, "misses": 0})
+    monkeypatch.setattr(shared, "icons_path", "")
+    return loaded
+
+
+def test_pixbuf_cached(pixbufs):
+    pixbuf = create_pixbuf("audio-volume-high", 16)
+    assert create_pixbuf("audio-volume-high", 16) is pixbuf
+    assert create_pixbuf("audio-volume-high", 24) is not pixbuf
+    assert pixbufs == [("audio-volume-high", 16), ("audio-volume-high", 24)]
+    assert tools.pixbuf_cache_stats == {"hits": 1, "misses": 2}
+
+
+def test_pixbuf_cache_bounded(pixbufs, monkeypatch):
+    monkeypatch.setattr(tools, "pixbuf_cache_size", 3)
+    for icon in ["a", "b", "c"]:
+        create_pixbuf(icon, 16)
+    # 'a' used recently, 'b' is the least recently used one
+    create_pixbuf("a", 16)
+    create_pixbuf("d", 16)
+    assert len(tools.pixbuf_cache) == 3
+    del pixbufs[:]
+    create_pixbuf("a", 16)
+    create_pixbuf("b", 16)
+    assert pixbufs == [("b", 16)]
+
+
+def test_pixbuf_cache_default_size(pixbufs):
+    for i in range(200):
+        create_pixbuf("icon-{}".format(i), 16)
+    assert len(tools.pixbuf_cache) == tools.pixbuf_cache_size == 128
+
+
+def test_pixbuf_source_modified(pixbufs, tmp_path):
+    source = tmp_path / "icon.svg"
+    source.write_text("<svg/>")
+    pixbuf = create_pixbuf(str(source), 16)
+    assert create_pixbuf(str(source), 16) is pixbuf
+
+    stat = source.stat()
+    os.utime(str(source), ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+    assert create_pixbuf(str(source), 16) is not pixbuf
+    assert len(pixbufs) == 2
+
+
+def test_pixbuf_icons_path(pixbufs, monkeypatch):
+    pixbuf = create_pixbuf("battery", 16)
+    monkeypatch.setattr(shared, "icons_path", "/usr/share/nwgcc/icons_dark")
+    assert create_pixbuf("battery", 16) is not pixbuf
+
+
+class IconInfo(object):
+    def __init__(self, filename):
+        self.filename = filename
+
+    def get_filename(self):
+        return self.filename
+
+    def load_icon(self):
+        return "pixbuf from {}".format(self.filename)
+
+
+class IconTheme(object):
+    def __init__(self, icons):
+        self.icons = icons
+
+    def lookup_icon(self, name, size, flags):
+        return IconInfo(self.icons[name]) if name in self.icons else None
+
+
+@pytest.fixture
+def icons(tmp_path, monkeypatch):
+    custom = tmp_path / "icons_dark"
+    custom.mkdir()
+    (custom / "battery.svg").write_text("<svg/>")
+    monkeypatch.setattr(shared, "icons_path", "")
+    monkeypatch.setattr(shared, "icon_theme", IconTheme({"battery": "/usr/share/icons/Adwaita/battery.svg",
+                                                         "volume": "/usr/share/icons/Adwaita/volume.svg",
+                                                         "builtin": None}))
+    return custom
+
+
+def test_resolve_theme_icon(icons):
+    key, source, render = resolve_icon("battery", 16)
+    assert key == "theme:battery:/usr/share/icons/Adwaita/battery.svg"
+    assert source == "/usr/share/icons/Adwaita/battery.svg"
+    assert render() == "pixbuf from /usr/share/icons/Adwaita/battery.svg"
+    # 'name.svg' written instead of 'name'
+    assert resolve_icon("battery.svg", 16)[0] == key
+    assert resolve_icon("missing", 16) is None
+    # not cached on disk
+    assert resolve_icon("builtin", 16)[0] is None
+
+
+def test_resolve_custom_icon(icons, monkeypatch):
+    monkeypatch.setattr(shared, "icons_path", str(icons))
+    path = str(icons / "battery.svg")
+    assert resolve_icon("battery", 16)[:2] == (path, path)
+    # no custom icon of such name: from the theme
+    assert resolve_icon("volume", 16)[1] == "/usr/share/icons/Adwaita/volume.svg"
+
+
+def test_resolve_full_path(icons, monkeypatch):
+    path = str(icons / "battery.svg")
+    assert resolve_icon(path, 16)[:2] == (path, path)
+    assert resolve_icon(str(icons / "missing.svg"), 16) is None
+
+
+def test_add_missing_preferences():
+    users = {"preferences": {"icon_set": "dark", "command_timeout_seconds": 3}, "icons": {"bt-on": "custom"}}
+    default = {"preferences": {"icon_set": "light", "command_timeout_seconds": 10, "row_refresh": {"volume": {}}},
+               "icons": {"bt-on": "bluetooth-active", "bt-off": "bluetooth-disabled"},
+               "commands": {"get_ssid": "iwgetid -r"}}
+    add_missing_preferences(users, default)
+    assert users == {"preferences": {"icon_set": "dark", "command_timeout_seconds": 3, "row_refresh": {"volume": {}}},
+                     "icons": {"bt-on": "custom", "bt-off": "bluetooth-disabled"},
+                     "commands": {"get_ssid": "iwgetid -r"}}
+
+
+@pytest.mark.parametrize("string, seconds", [
+    ("500ms", 0.5),
+    ("10s", 10),
+    ("10", 10),
+    ("1.5m", 90),
+    ("1h", 3600),
+])
+def test_parse_duration(string, seconds):
+    assert parse_duration(string) == pytest.approx(seconds)
+
+
+def test_plain_line():
+    assert parse_cli_line("uptime -p") == CliCommand("uptime -p", None, None)
+
+
+def test_annotations():
+    assert parse_cli_line("curl -s wttr.in?format=3  # @every 30m @timeout 5s") == CliCommand(
+        "curl -s wttr.in?format=3", 1800, 5)
+    assert parse_cli_line("date +%H:%M # @every 500ms") == CliCommand("date +%H:%M", 0.5, None)
+    assert parse_cli_line("sensors | grep Tctl #@timeout 2") == CliCommand("sensors | grep Tctl", None, 2)
+
+
+def test_not_annotations():
+    # a comment, or '#' within the command, is left to the shell
+    assert parse_cli_line("echo '#1' # just a comment") == CliCommand("echo '#1' # just a comment", None, None)
+    assert parse_cli_line("echo a#@every 5s") == CliCommand("echo a#@every 5s", None, None)
+
+
+def test_run_cli_command():
+    assert run_cli_command(CliCommand("echo one | tr o 0", None, 3)) == "0ne"
+    assert run_cli_command(CliCommand("echo partial; exit 1", None, 3)) == ""
+    assert run_cli_command(CliCommand("sleep 5", None, 0.3)) is None
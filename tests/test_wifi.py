@@ -0,0 +1,72 @@
+import pytest
+
+pytest.importorskip("gi")
+from nwgcc import wifi
+from nwgcc.wifi import get_signal, wireless_interfaces
+
+HEADER = """Inter-| sta-|   Quality        |   Discarded packets               | Missed | WE
+ face | tus | link level noise |  nwid  crypt   frag  retry   misc | beacon | 22
+"""
+
+
+@pytest.fixture
+def proc(tmp_path, monkeypatch):
+    path = tmp_path / "wireless"
+    monkeypatch.setattr(wifi, "proc_wireless", str(path))
+
+    def write(*lines):
+        path.write_text(HEADER + "".join(line + "\n" for line in lines))
+
+    return write
+
+
+def test_signal(proc):
+    proc("wlp2s0: 0000   56.  -54.  -256        0      0      0      0     17        0",
+         " wlan0: 0000   70.  -30.  -256        0      0      0      0      0        0")
+    assert get_signal("wlp2s0") == 80
+    assert get_signal("wlan0") == 100
+
+
+def test_capped(proc):
+    proc("wlan0: 0000   94.  -20.  -256        0      0      0      0      0        0")
+    assert get_signal("wlan0") == 100
+
+
+def test_missing_interface(proc):
+    proc("wlan0: 0000   56.  -54.  -256        0      0      0      0     17        0")
+    assert get_signal("wlan1") is None
+    # not a prefix match
+    assert get_signal("wlan") is None
+
+
+def test_no_interfaces(proc):
+    proc()
+    assert get_signal("wlan0") is None
+
+
+@pytest.mark.parametrize("line", ["wlan0: 0000", "wlan0: 0000   n/a.  -54.  -256", "wlan0:"])
+def test_malformed(proc, line):
+    proc(line)
+    assert get_signal("wlan0") is None
+
+
+def test_header_only_lines_skipped(tmp_path, monkeypatch):
+    # an interface named like a header word must not match the header lines
+    path = tmp_path / "wireless"
+    path.write_text("face: 0000 1. 2. 3\nface: 0000 1. 2. 3\n")
+    monkeypatch.setattr(wifi, "proc_wireless", str(path))
+    assert get_signal("face") is None
+
+
+def test_no_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(wifi, "proc_wireless", str(tmp_path / "missing"))
+    assert get_signal("wlan0") is None
+
+
+def test_wireless_interfaces(tmp_path, monkeypatch):
+    monkeypatch.setattr(wifi, "sysfs_dir", str(tmp_path))
+    for name in ["lo", "wlp2s0", "enp3s0", "wlan0"]:
+        (tmp_path / name).mkdir()
+    (tmp_path / "wlp2s0" / "wireless").mkdir()
+    (tmp_path / "wlan0" / "wireless").mkdir()
+    assert wireless_interfaces() == ["wlan0", "wlp2s0"]